@@ -0,0 +1,151 @@
+from urllib.parse import quote_plus, unquote_plus, urlsplit, urlunsplit
+from weakref import WeakKeyDictionary
+import hashlib
+import json
+import re
+
+from scrapy import Request
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query parameters that only identify a click or campaign, or a session of a framework that names it unambiguously
+_TRACKING_PARAMETERS = {
+    "gclid",
+    "gclsrc",
+    "dclid",
+    "gbraid",
+    "wbraid",
+    "fbclid",
+    "msclkid",
+    "yclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "_ga",
+    "_gl",
+    "_hsenc",
+    "_hsmi",
+    "pk_campaign",
+    "pk_kwd",
+    "pk_source",
+    "pk_medium",
+    "pk_content",
+    "pk_cid",
+    "phpsessid",
+    "jsessionid",
+    "aspsessionid",
+}
+_TRACKING_PREFIXES = ("utm_", "hsa_")
+
+# e.g. /page;jsessionid=0123ABCD
+_SESSION_PATH_PARAMETER = re.compile(r";(?:jsessionid|phpsessid)=[^/]*", re.I)
+
+
+def _is_tracking(parameter: str) -> bool:
+    parameter = parameter.lower()
+    return parameter in _TRACKING_PARAMETERS or parameter.startswith(_TRACKING_PREFIXES)
+
+
+def _canonical_query(query: str) -> str:
+    # Like urlencode(sorted(parse_qsl(query, keep_blank_values=True))), but a parameter without "=" keeps none
+    parameters = []
+    for parameter in query.split("&"):
+        if not parameter:
+            continue
+        name, equals, value = parameter.partition("=")
+        name = unquote_plus(name)
+        if not _is_tracking(name):
+            parameters.append((name, bool(equals), unquote_plus(value)))
+    return "&".join(
+        quote_plus(name) + ("=" + quote_plus(value) if equals else "")
+        for name, equals, value in sorted(parameters)
+    )
+
+
+def canonicalise_url(url: str) -> str:
+    """
+    The form of a URL that is requested and stored: lowercase scheme and host, no default port, fragment or tracking
+    and session parameters, and a sorted query.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS:
+        return url
+
+    host = parts.hostname or ""
+    if ":" in host:
+        host = f"[{host}]"
+    try:
+        port = parts.port
+    except ValueError:
+        return url
+    netloc = (
+        host if port is None or port == _DEFAULT_PORTS[scheme] else f"{host}:{port}"
+    )
+    if "@" in parts.netloc:
+        netloc = parts.netloc.rpartition("@")[0] + "@" + netloc
+
+    path = _SESSION_PATH_PARAMETER.sub("", parts.path) or "/"
+    return urlunsplit((scheme, netloc, path, _canonical_query(parts.query), ""))
+
+
+def url_identity(url: str) -> str:
+    """
+    Collapses canonical URLs that sites almost always serve the same page under: http and https, with and without a
+    www. prefix, and with and without a trailing slash.
+    """
+    return _canonical_identity(canonicalise_url(url))
+
+
+def _canonical_identity(canonical_url: str) -> str:
+    parts = urlsplit(canonical_url)
+    scheme = "https" if parts.scheme == "http" else parts.scheme
+    netloc = parts.netloc.removeprefix("www.")
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+def canonicalise_urls(urls: list[str]) -> tuple[list[str], int, int]:
+    """
+    Canonicalises URLs, dropping any with the same identity as an earlier one.
+    Returns the URLs left and the numbers of URLs rewritten and collapsed.
+    """
+    canonical = []
+    identities = set()
+    rewritten = 0
+    for url in urls:
+        canonical_url = canonicalise_url(url)
+        rewritten += canonical_url != url
+        identity = _canonical_identity(canonical_url)
+        if identity not in identities:
+            identities.add(identity)
+            canonical.append(canonical_url)
+    return canonical, rewritten, len(urls) - len(canonical)
+
+
+class CanonicalRequestFingerprinter:
+    """
+    Fingerprints requests by their URL's identity rather than its raw form, so the duplicate filter drops variants of
+    URLs already seen.
+    """
+
+    def __init__(self):
+        self._cache: WeakKeyDictionary[Request, bytes] = WeakKeyDictionary()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls()
+
+    def fingerprint(self, request: Request) -> bytes:
+        if request not in self._cache:
+            self._cache[request] = hashlib.sha1(
+                json.dumps(
+                    {
+                        "method": request.method,
+                        "url": url_identity(request.url),
+                        "body": (request.body or b"").hex(),
+                    },
+                    sort_keys=True,
+                ).encode()
+            ).digest()
+        return self._cache[request]
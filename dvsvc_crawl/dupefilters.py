@@ -0,0 +1,188 @@
+from math import ceil, log
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+
+from scrapy import Request
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.utils.job import job_dir
+
+_BLOOM_VERSION = 1
+_COMMIT_EVERY = 10_000
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that adds a larger, stricter slice whenever the newest one is full, so its false positive rate stays
+    below error_rate however many keys are added.
+    """
+
+    def __init__(
+        self,
+        initial_capacity: int = 1 << 20,
+        error_rate: float = 0.001,
+        growth: int = 2,
+        tightening: float = 0.5,
+    ):
+        self.initial_capacity = initial_capacity
+        # Split between the slices, as a geometric series
+        self.error_rate = error_rate * (1 - tightening)
+        self.growth = growth
+        self.tightening = tightening
+        # Bits, bit count, hash count, capacity and key count of each slice
+        self.slices: list[list] = []
+        self.count = 0
+        self._add_slice()
+
+    def _add_slice(self) -> None:
+        n = len(self.slices)
+        capacity = self.initial_capacity * self.growth**n
+        error_rate = self.error_rate * self.tightening**n
+        bit_count = ceil(-capacity * log(error_rate) / log(2) ** 2)
+        hash_count = ceil(-log(error_rate, 2))
+        self.slices.append(
+            [bytearray((bit_count + 7) // 8), bit_count, hash_count, capacity, 0]
+        )
+
+    @staticmethod
+    def _hashes(key: bytes) -> tuple[int, int]:
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        return (
+            int.from_bytes(digest[:8], "little"),
+            int.from_bytes(digest[8:], "little") | 1,
+        )
+
+    def __contains__(self, key: bytes) -> bool:
+        h1, h2 = self._hashes(key)
+        for bits, bit_count, hash_count, _, _ in self.slices:
+            for i in range(hash_count):
+                position = (h1 + i * h2) % bit_count
+                if not bits[position >> 3] & (1 << (position & 7)):
+                    break
+            else:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, key: bytes) -> None:
+        if self.slices[-1][4] >= self.slices[-1][3]:
+            self._add_slice()
+        bits, bit_count, hash_count, _, _ = newest = self.slices[-1]
+        h1, h2 = self._hashes(key)
+        for i in range(hash_count):
+            position = (h1 + i * h2) % bit_count
+            bits[position >> 3] |= 1 << (position & 7)
+        newest[4] += 1
+        self.count += 1
+
+    def save(self, path: str) -> None:
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump({"version": _BLOOM_VERSION, "filter": self.__dict__}, file)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ScalableBloomFilter | None":
+        with open(path, "rb") as file:
+            data = pickle.load(file)
+        if data.get("version") != _BLOOM_VERSION:
+            return None
+        bloom = cls.__new__(cls)
+        bloom.__dict__.update(data["filter"])
+        return bloom
+
+
+class BloomDupeFilter(RFPDupeFilter):
+    """
+    Duplicate request filter holding only a Bloom filter of fingerprints in memory. Fingerprints the filter may have
+    seen are confirmed against an exact store in SQLite, which with the filter persists in JOBDIR if set.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        debug: bool = False,
+        *,
+        fingerprinter=None,
+        stats=None,
+        initial_capacity: int = 1 << 20,
+        error_rate: float = 0.001,
+    ):
+        super().__init__(None, debug, fingerprinter=fingerprinter)
+        self.stats = stats
+        self.uncommitted = 0
+
+        if path:
+            self.db_path = os.path.join(path, "requests.seen.sqlite")
+            self.bloom_path = os.path.join(path, "requests.seen.bloom")
+            self.temporary = False
+        else:
+            handle, self.db_path = tempfile.mkstemp(suffix=".sqlite")
+            os.close(handle)
+            self.bloom_path = None
+            self.temporary = True
+
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS seen (fingerprint BLOB PRIMARY KEY) WITHOUT ROWID"
+        )
+        (seen_count,) = self.db.execute("SELECT COUNT(*) FROM seen").fetchone()
+
+        self.bloom = None
+        if self.bloom_path and os.path.exists(self.bloom_path):
+            self.bloom = ScalableBloomFilter.load(self.bloom_path)
+        # The filter is only saved on close, so after a crash it is rebuilt from the exact store
+        if self.bloom is None or len(self.bloom) != seen_count:
+            self.bloom = ScalableBloomFilter(
+                max(initial_capacity, seen_count), error_rate
+            )
+            for (fingerprint,) in self.db.execute("SELECT fingerprint FROM seen"):
+                self.bloom.add(fingerprint)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            job_dir(settings),
+            settings.getbool("DUPEFILTER_DEBUG"),
+            fingerprinter=crawler.request_fingerprinter,
+            stats=crawler.stats,
+            initial_capacity=settings.getint("DVSVC_DUPEFILTER_CAPACITY", 1 << 20),
+            error_rate=settings.getfloat("DVSVC_DUPEFILTER_ERROR_RATE", 0.001),
+        )
+
+    def request_seen(self, request: Request) -> bool:
+        fingerprint = self.fingerprinter.fingerprint(request)
+        if fingerprint in self.bloom:
+            if self.db.execute(
+                "SELECT 1 FROM seen WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone():
+                return True
+            if self.stats:
+                self.stats.inc_value("dupefilter/bloom_false_positives")
+
+        self.bloom.add(fingerprint)
+        self.db.execute("INSERT INTO seen VALUES (?)", (fingerprint,))
+        self.uncommitted += 1
+        if self.uncommitted >= _COMMIT_EVERY:
+            self.db.commit()
+            self.uncommitted = 0
+        return False
+
+    def close(self, reason: str) -> None:
+        self.db.commit()
+        self.db.close()
+        if self.temporary:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.db_path + suffix):
+                    os.remove(self.db_path + suffix)
+        else:
+            self.bloom.save(self.bloom_path)
+        if self.stats:
+            self.stats.set_value("dupefilter/seen", len(self.bloom))
@@ -0,0 +1,87 @@
+from math import inf
+from urllib.parse import urlsplit
+import re
+
+from dvsvc_crawl import helpers
+from dvsvc_crawl.middlewares import IGNORE_FLDS
+from dvsvc_crawl.signals import fld_blacklisted
+from heuristics.scorers import LinkScorer, Score
+
+_ADMITTED_SCHEMES = {"http", "https"}
+
+
+class Frontier:
+    """
+    Decides which extracted links are scheduled, before a Request is built for them.
+    Rejected links are counted per reason under frontier/dropped/ in the crawler stats.
+    """
+
+    def __init__(
+        self,
+        link_scorer: LinkScorer,
+        min_lscore: float | None = None,
+        drop_out_of_scope: bool = True,
+        deny_patterns: list[str] | None = None,
+        stats=None,
+    ):
+        # Links matching a predicate that vetoes them outright, e.g. an out-of-scope TLD
+        self.out_of_scope_mask = (
+            sum(
+                1 << i
+                for i, predicate in enumerate(link_scorer.predicates)
+                if predicate.constant_weight == -inf
+            )
+            if drop_out_of_scope
+            else 0
+        )
+        self.min_lscore = min_lscore
+        self.deny = (
+            re.compile("|".join(f"(?:{p})" for p in deny_patterns))
+            if deny_patterns
+            else None
+        )
+        self.stats = stats
+        self.blacklisted_flds = set(IGNORE_FLDS)
+
+    @classmethod
+    def from_crawler(cls, crawler, link_scorer: LinkScorer) -> "Frontier":
+        min_lscore = crawler.settings.get("DVSVC_FRONTIER_MIN_LSCORE")
+        frontier = cls(
+            link_scorer,
+            float(min_lscore) if min_lscore is not None else None,
+            crawler.settings.getbool("DVSVC_FRONTIER_DROP_OUT_OF_SCOPE", True),
+            crawler.settings.getlist("DVSVC_FRONTIER_DENY_PATTERNS"),
+            crawler.stats,
+        )
+        crawler.signals.connect(frontier.blacklist_fld, signal=fld_blacklisted)
+        return frontier
+
+    def blacklist_fld(self, fld: str) -> None:
+        self.blacklisted_flds.add(fld)
+
+    def rejection(self, link: str, lscore: Score) -> str | None:
+        """
+        The reason a link is not admitted, or None if it is.
+        """
+        if lscore.mask & self.out_of_scope_mask:
+            return "out_of_scope"
+        if self.min_lscore is not None and lscore.value < self.min_lscore:
+            return "low_lscore"
+        if urlsplit(link).scheme not in _ADMITTED_SCHEMES:
+            return "scheme"
+        if self.deny and self.deny.search(link):
+            return "denied"
+        try:
+            if helpers.get_fld(link) in self.blacklisted_flds:
+                return "blacklisted"
+        except ValueError:
+            return "no_fld"
+        return None
+
+    def admit(self, link: str, lscore: Score) -> bool:
+        reason = self.rejection(link, lscore)
+        if self.stats:
+            self.stats.inc_value(
+                f"frontier/dropped/{reason}" if reason else "frontier/admitted"
+            )
+        return reason is None
@@ -1,9 +1,58 @@
+from urllib.parse import urlsplit
+import re
 import typing
 import tld
 
+from scrapy import Request
+from scrapy.http import Response
+
+from heuristics.helpers import LRUCache
+
+# Hostnames are few compared to URLs, and pages of the same site are usually requested in quick succession
+_FLD_CACHE = LRUCache(100_000)
+
+# The hostname of a plain absolute URL, without parsing the rest of it
+_HOSTNAME = re.compile(
+    r"[a-zA-Z][a-zA-Z0-9+.-]*://(?:[^/?#@\[\s]*@)?([^/?#:@\[\s]*)(?=[:/?#]|$)"
+)
+
+
+def get_hostname(url: str) -> str | None:
+    match = _HOSTNAME.match(url)
+    if match:
+        return match[1].lower()
+    return urlsplit(url).hostname
+
 
 def get_fld(url: str) -> str:
-    tld_obj = tld.get_tld(url, as_object=True)
+    hostname = get_hostname(url)
+    fld = _FLD_CACHE.get(hostname)
+    if fld is None:
+        fld = _fld_of_hostname(hostname)
+        _FLD_CACHE.put(hostname, fld)
+    if not fld:
+        raise ValueError(f"Could not extract FLD from URL: {url}")
+    return fld
+
+
+def _fld_of_hostname(hostname: str | None) -> str:
+    # Looked up in tld's public suffix trie, with an empty string cached for hostnames that have no FLD
+    if not hostname:
+        return ""
+    tld_obj = tld.get_tld(
+        hostname, fix_protocol=True, as_object=True, fail_silently=True
+    )
     if tld_obj:
         return typing.cast(tld.Result, tld_obj).fld
-    raise ValueError(f"Could not extract FLD from URL: {url}")
+    return ""
+
+
+def request_fld(request: Request | Response) -> str:
+    """
+    The FLD of a request or its response, as resolved when the request was yielded if known.
+    """
+    return request.meta.get("fld") or get_fld(request.url)
+
+
+def fld_cache_stats() -> tuple[int, int]:
+    return _FLD_CACHE.hits, _FLD_CACHE.misses
@@ -0,0 +1,203 @@
+from datetime import datetime, timezone
+from typing import Callable
+import os
+import sqlite3
+import struct
+import tempfile
+
+from dvsvc_crawl.items import DvsvcCrawlItem
+from heuristics.helpers import LRUCache
+from heuristics.scorers import Score, predicates_fingerprint
+
+# pscore value, mask length, truncated; lscore value, mask length, present; time queued and crawled in microseconds
+# since the epoch, each with whether it was timezone-aware; registry names and link lengths
+_ITEM = struct.Struct("<dH?dH?q?q?HH")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_COMMIT_EVERY = 1000
+
+
+def _pack_time(time: datetime) -> tuple[int, bool]:
+    aware = time.tzinfo is not None
+    delta = (time if aware else time.replace(tzinfo=timezone.utc)) - _EPOCH
+    return delta // datetime.resolution, aware
+
+
+def _unpack_time(microseconds: int, aware: bool) -> datetime:
+    time = _EPOCH + microseconds * datetime.resolution
+    return time if aware else time.replace(tzinfo=None)
+
+
+def _mask_bytes(mask: int) -> bytes:
+    return mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+
+
+def pack_item(item: DvsvcCrawlItem) -> bytes:
+    """
+    Packs a crawl item into a record of its scores' values and predicate masks, its times and its link.
+    """
+    pscore = item["pscore"]
+    lscore = item["lscore"]
+    pmask = _mask_bytes(pscore.mask)
+    lmask = _mask_bytes(lscore.mask) if lscore is not None else b""
+    registries = "\0".join(
+        [pscore.registry or "", (lscore.registry if lscore is not None else None) or ""]
+    ).encode("utf-8")
+    link = item["link"].encode("utf-8")
+    return (
+        _ITEM.pack(
+            pscore.value,
+            len(pmask),
+            pscore.truncated,
+            lscore.value if lscore is not None else 0.0,
+            len(lmask),
+            lscore is not None,
+            *_pack_time(item["time_queued"]),
+            *_pack_time(item["time_crawled"]),
+            len(registries),
+            len(link),
+        )
+        + pmask
+        + lmask
+        + registries
+        + link
+    )
+
+
+def unpack_item(record: bytes) -> DvsvcCrawlItem:
+    (
+        pvalue,
+        pmask_length,
+        truncated,
+        lvalue,
+        lmask_length,
+        has_lscore,
+        queued,
+        queued_aware,
+        crawled,
+        crawled_aware,
+        registries_length,
+        link_length,
+    ) = _ITEM.unpack_from(record)
+
+    offset = _ITEM.size
+    pmask = int.from_bytes(record[offset : offset + pmask_length], "little")
+    offset += pmask_length
+    lmask = int.from_bytes(record[offset : offset + lmask_length], "little")
+    offset += lmask_length
+    page_registry, link_registry = (
+        record[offset : offset + registries_length].decode("utf-8").split("\0")
+    )
+    offset += registries_length
+    link = record[offset : offset + link_length].decode("utf-8")
+
+    return DvsvcCrawlItem(
+        link=link,
+        pscore=Score(pvalue, pmask, page_registry or None, truncated),
+        lscore=(Score(lvalue, lmask, link_registry or None) if has_lscore else None),
+        time_queued=_unpack_time(queued, queued_aware),
+        time_crawled=_unpack_time(crawled, crawled_aware),
+    )
+
+
+def item_pscore(record: bytes) -> float:
+    return _ITEM.unpack_from(record)[0]
+
+
+class FLDHistoryStore(LRUCache):
+    """
+    LRU cache of per-FLD histories that spills the least recently used to SQLite rather than dropping them, and
+    persists them all on close if given a path.
+    Histories are serialised with to_bytes() and restored with decode. Those persisted under other predicates are
+    discarded on opening, as the masks of their items' Scores would index into the wrong predicates.
+    """
+
+    def __init__(
+        self, max_size: int, decode: Callable[[bytes], object], path: str | None = None
+    ):
+        super().__init__(max_size)
+        self.decode = decode
+        self.spilled = 0
+        self.uncommitted = 0
+
+        self.temporary = not path
+        if self.temporary:
+            handle, path = tempfile.mkstemp(suffix=".sqlite")
+            os.close(handle)
+        else:
+            # JOBDIR is only created by Scrapy once the scheduler opens, after the spider
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS histories (fld TEXT PRIMARY KEY, history BLOB) WITHOUT ROWID"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+        )
+
+        self.discarded = 0
+        fingerprint = predicates_fingerprint()
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE name = 'predicates'"
+        ).fetchone()
+        if row is not None and row[0] != fingerprint:
+            (self.discarded,) = self.db.execute(
+                "SELECT COUNT(*) FROM histories"
+            ).fetchone()
+            self.db.execute("DELETE FROM histories")
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('predicates', ?)", (fingerprint,)
+        )
+        self.db.commit()
+
+    def get(self, key: str, default=None):
+        history = super().get(key)
+        if history is not None:
+            return history
+
+        row = self.db.execute(
+            "SELECT history FROM histories WHERE fld = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        history = self.decode(row[0])
+        self.put(key, history)
+        return history
+
+    def put(self, key: str, value) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self._write(*self.entries.popitem(last=False))
+            self.spilled += 1
+
+    def pop(self, key: str) -> None:
+        self.entries.pop(key, None)
+        self.db.execute("DELETE FROM histories WHERE fld = ?", (key,))
+        self._changed()
+
+    def _write(self, key: str, value) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO histories VALUES (?, ?)", (key, value.to_bytes())
+        )
+        self._changed()
+
+    def _changed(self) -> None:
+        self.uncommitted += 1
+        if self.uncommitted >= _COMMIT_EVERY:
+            self.db.commit()
+            self.uncommitted = 0
+
+    def close(self) -> None:
+        if not self.temporary:
+            for key, value in self.entries.items():
+                self._write(key, value)
+        self.db.commit()
+        self.db.close()
+        if self.temporary:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
@@ -1,15 +1,17 @@
-from scrapy.exceptions import IgnoreRequest
+from scrapy.exceptions import IgnoreRequest, NotConfigured
 from scrapy.http import Response
 
 from dvsvc_crawl import helpers
+from dvsvc_crawl.signals import fld_blacklisted
 from dvsvc_crawl.spiders import get_spiders_logger
+from heuristics.helpers import LRUCache
 
 FLD_BAD_RESPONSES_ALLOWED = 10
 FLD_MAX_REQUESTS_ALLOWED = 100
 
 _LOGGER = get_spiders_logger()
 
-_IGNORE_FLDS = {
+IGNORE_FLDS = {
     # By reach, from https://www.pressgazette.co.uk/media-audience-and-business-data/media_metrics/most-popular-websites-news-uk-monthly-2/
     "bbc.com",
     "thesun.co.uk",
@@ -154,14 +156,19 @@ _IGNORE_FLDS = {
 
 
 class DvsvcBlacklistMiddleware:
-    def __init__(self):
+    def __init__(self, crawler=None):
+        self.crawler = crawler
         self.fld_blacklist = set()
         self.fld_requests = {}
         self.fld_bad_responses = {}
-        self.fld_blacklist.update(_IGNORE_FLDS)
+        self.fld_blacklist.update(IGNORE_FLDS)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
 
     def process_request(self, request, spider):
-        fld = helpers.get_fld(request.url)
+        fld = helpers.request_fld(request)
 
         if fld in self.fld_blacklist:
             raise IgnoreRequest(f"Ignoring request to blacklisted FLD: {request.url}")
@@ -172,7 +179,7 @@ class DvsvcBlacklistMiddleware:
             self.fld_requests[fld] >= FLD_MAX_REQUESTS_ALLOWED
             and fld not in self.fld_blacklist
         ):
-            self.fld_blacklist.add(fld)
+            self.blacklist(fld)
             _LOGGER.info(f"Blacklisted FLD (maximum requests reached): {fld}")
 
         return None  # Continue with the same request
@@ -180,7 +187,7 @@ class DvsvcBlacklistMiddleware:
     def process_response(self, request, response, spider):
         # Increment counter for non-200 responses
         if response.status != 200:
-            self.add_bad_response(helpers.get_fld(request.url))
+            self.add_bad_response(helpers.request_fld(request))
         return response
 
     def process_exception(self, request, exception, spider):
@@ -188,7 +195,7 @@ class DvsvcBlacklistMiddleware:
             # Propagate rudimentary response to spider so it may be processed
             return Response(url=request.url, status=400, request=request)
         elif isinstance(exception, TimeoutError):
-            self.add_bad_response(helpers.get_fld(request.url))
+            self.add_bad_response(helpers.request_fld(request))
             return Response(url=request.url, status=408, request=request)
         # Non-IgnoreRequest exceptions will be propagated to other middleware
         return None
@@ -202,5 +209,131 @@ class DvsvcBlacklistMiddleware:
             self.fld_bad_responses[fld] >= FLD_BAD_RESPONSES_ALLOWED
             and fld not in self.fld_blacklist
         ):
-            self.fld_blacklist.add(fld)
+            self.blacklist(fld)
             _LOGGER.info(f"Blacklisted FLD (too many bad responses): {fld}")
+
+    def blacklist(self, fld):
+        self.fld_blacklist.add(fld)
+        # Lets the scheduler and frontier drop the FLD's requests before they are downloaded
+        if self.crawler:
+            self.crawler.signals.send_catch_log(fld_blacklisted, fld=fld)
+
+
+class _HostPoliteness:
+    def __init__(self, delay: float, concurrency: int):
+        self.delay = delay
+        self.concurrency = concurrency
+        self.successes = 0  # Consecutive healthy responses
+        self.errors = 0
+
+    def to_stats(self) -> dict:
+        return {
+            "delay": round(self.delay, 3),
+            "concurrency": self.concurrency,
+            "errors": self.errors,
+        }
+
+
+class DvsvcPolitenessMiddleware:
+    """
+    Adapts each download slot's (by default, each host's) delay and concurrency to how it responds.
+    A slot sends a request per delay without waiting for responses, so a host slower than its delay has several in
+    flight, up to its concurrency. Errors, timeouts and slow responses double the delay and halve the concurrency,
+    and Retry-After is honoured. Healthy responses shorten the delay and, after a run of them, restore a concurrent
+    request.
+    The state of the DVSVC_POLITENESS_MAX_HOSTS most recently seen hosts is kept, and that of those slowed down is
+    reported under politeness/hosts in the crawler stats.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("DVSVC_POLITENESS_ENABLED"):
+            raise NotConfigured
+        self.crawler = crawler
+        self.start_delay = settings.getfloat("DOWNLOAD_DELAY")
+        self.start_concurrency = settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN")
+        self.min_delay = settings.getfloat("DVSVC_POLITENESS_MIN_DELAY", 1.0)
+        self.max_delay = settings.getfloat("DVSVC_POLITENESS_MAX_DELAY", 60.0)
+        self.slow_latency = settings.getfloat("DVSVC_POLITENESS_SLOW_LATENCY", 5.0)
+        self.hosts = LRUCache(settings.getint("DVSVC_POLITENESS_MAX_HOSTS", 100_000))
+        # Stats of the hosts in self.hosts that are slowed down, updated in place
+        self.slowed_hosts: dict[str, dict] = {}
+        if crawler.stats:
+            crawler.stats.set_value("politeness/hosts", self.slowed_hosts)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def process_response(self, request, response, spider):
+        latency = request.meta.get("download_latency")
+        # Responses made up by DvsvcBlacklistMiddleware have no latency, but its 408s are timeouts
+        if latency is None and response.status != 408:
+            return response
+
+        key = request.meta.get("download_slot")
+        if key is None:
+            return response
+        state = self.hosts.get(key)
+        if state is None:
+            state = _HostPoliteness(
+                max(self.start_delay, self.min_delay), self.start_concurrency
+            )
+            self._track(key, state)
+
+        if response.status in (408, 429) or response.status >= 500:
+            state.successes = 0
+            state.errors += 1
+            state.delay = max(state.delay * 2, self._retry_after(response))
+            state.concurrency = max(1, state.concurrency // 2)
+            self._inc_stat("politeness/backoff/error")
+        elif latency > self.slow_latency:
+            state.successes = 0
+            state.delay *= 2
+            state.concurrency = max(1, state.concurrency // 2)
+            self._inc_stat("politeness/backoff/slow")
+        else:
+            state.successes += 1
+            state.delay *= 0.8
+            if state.successes % 10 == 0:
+                state.concurrency = min(self.start_concurrency, state.concurrency + 1)
+        state.delay = min(max(state.delay, self.min_delay), self.max_delay)
+
+        self._apply(key, state)
+        return response
+
+    @staticmethod
+    def _retry_after(response) -> float:
+        try:
+            return float(response.headers.get("Retry-After", b"0"))
+        except ValueError:
+            # An HTTP date rather than seconds
+            return 0.0
+
+    def _inc_stat(self, key: str) -> None:
+        if self.crawler.stats:
+            self.crawler.stats.inc_value(key)
+
+    def _track(self, key: str, state: _HostPoliteness) -> None:
+        if len(self.hosts) >= self.hosts.max_size:
+            evicted, _ = self.hosts.entries.popitem(last=False)
+            self.crawler.engine.downloader.per_slot_settings.pop(evicted, None)
+            self.slowed_hosts.pop(evicted, None)
+        self.hosts.put(key, state)
+
+    def _apply(self, key: str, state: _HostPoliteness) -> None:
+        downloader = self.crawler.engine.downloader
+        slot = downloader.slots.get(key)
+        if slot is not None:
+            slot.delay = state.delay
+            slot.concurrency = state.concurrency
+        # Slots are dropped when idle, so recreate them as they were left
+        downloader.per_slot_settings[key] = {
+            "delay": state.delay,
+            "concurrency": state.concurrency,
+        }
+
+        if state.delay > self.min_delay or state.concurrency < self.start_concurrency:
+            self.slowed_hosts[key] = state.to_stats()
+        else:
+            self.slowed_hosts.pop(key, None)
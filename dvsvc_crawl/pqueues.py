@@ -0,0 +1,268 @@
+from collections import deque
+from heapq import heappop, heappush
+from math import inf
+import os
+import pickle
+import sqlite3
+
+from scrapy import Request
+from scrapy.utils.request import request_from_dict
+
+from dvsvc_crawl import helpers
+from dvsvc_crawl.signals import fld_blacklisted
+from dvsvc_crawl.spiders import get_spiders_logger
+from heuristics.scorers import predicates_fingerprint
+
+_COMMIT_EVERY = 1000
+
+
+def request_fld(request: Request) -> str:
+    try:
+        return helpers.request_fld(request)
+    except ValueError:
+        return ""
+
+
+class _Band:
+    """
+    Requests of the same integer priority: a heap per FLD, ordered by lscore, and the FLDs taking turns.
+    """
+
+    def __init__(self):
+        self.heaps: dict[str, list] = {}
+        self.rotation: deque[str] = deque()
+        self.size = 0
+
+    def push(self, fld: str, entry: tuple) -> None:
+        heap = self.heaps.get(fld)
+        if heap is None:
+            heap = self.heaps[fld] = []
+            self.rotation.append(fld)
+        heappush(heap, entry)
+        self.size += 1
+
+    def peek(self) -> tuple:
+        return self.heaps[self.rotation[0]][0]
+
+    def pop(self) -> tuple:
+        fld = self.rotation.popleft()
+        heap = self.heaps[fld]
+        entry = heappop(heap)
+        if heap:
+            self.rotation.append(fld)
+        else:
+            del self.heaps[fld]
+        self.size -= 1
+        return entry
+
+    def purge(self, fld: str) -> list:
+        heap = self.heaps.pop(fld, None)
+        if heap is None:
+            return []
+        self.rotation.remove(fld)
+        self.size -= len(heap)
+        return heap
+
+
+class _MemoryStore:
+    rejected = 0
+
+    def __init__(self):
+        self.requests: dict[int, Request] = {}
+
+    def put(self, seq: int, band: int, fld: str, key: float, request: Request):
+        self.requests[seq] = request
+
+    def get(self, seq: int) -> Request:
+        return self.requests[seq]
+
+    def take(self, seq: int) -> Request:
+        return self.requests.pop(seq)
+
+    def discard(self, seqs: list[int]) -> None:
+        for seq in seqs:
+            del self.requests[seq]
+
+    def entries(self) -> list[tuple[int, int, str, float]]:
+        return []
+
+    def close(self) -> None:
+        pass
+
+
+class _SqliteStore:
+    """
+    Pending requests serialised to SQLite, so only their heap entries are held in memory and they survive restarts.
+    Requests stored under other predicates are rejected on opening, as the masks of the Scores in their meta would
+    index into the wrong predicates.
+    """
+
+    def __init__(self, path: str, crawler):
+        self.crawler = crawler
+        self.uncommitted = 0
+        self.db = sqlite3.connect(os.path.join(path, "requests.sqlite"))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS requests"
+            " (seq INTEGER PRIMARY KEY, band INTEGER, fld TEXT, key REAL, request BLOB)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+        )
+
+        self.rejected = 0
+        fingerprint = predicates_fingerprint()
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE name = 'predicates'"
+        ).fetchone()
+        if row is not None and row[0] != fingerprint:
+            (self.rejected,) = self.db.execute(
+                "SELECT COUNT(*) FROM requests"
+            ).fetchone()
+            self.db.execute("DELETE FROM requests")
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('predicates', ?)", (fingerprint,)
+        )
+        self.db.commit()
+
+    def put(self, seq: int, band: int, fld: str, key: float, request: Request):
+        try:
+            data = pickle.dumps(request.to_dict(spider=self.crawler.spider), protocol=4)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise ValueError(str(e)) from e
+        self.db.execute(
+            "INSERT INTO requests VALUES (?, ?, ?, ?, ?)", (seq, band, fld, key, data)
+        )
+        self._changed()
+
+    def get(self, seq: int) -> Request:
+        (data,) = self.db.execute(
+            "SELECT request FROM requests WHERE seq = ?", (seq,)
+        ).fetchone()
+        return request_from_dict(pickle.loads(data), spider=self.crawler.spider)
+
+    def take(self, seq: int) -> Request:
+        request = self.get(seq)
+        self.db.execute("DELETE FROM requests WHERE seq = ?", (seq,))
+        self._changed()
+        return request
+
+    def discard(self, seqs: list[int]) -> None:
+        self.db.executemany(
+            "DELETE FROM requests WHERE seq = ?", [(seq,) for seq in seqs]
+        )
+        self._changed(len(seqs))
+
+    def _changed(self, count: int = 1) -> None:
+        self.uncommitted += count
+        if self.uncommitted >= _COMMIT_EVERY:
+            self.db.commit()
+            self.uncommitted = 0
+
+    def entries(self) -> list[tuple[int, int, str, float]]:
+        return self.db.execute("SELECT seq, band, fld, key FROM requests").fetchall()
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
+
+
+class FldFairPriorityQueue:
+    """
+    Scheduler priority queue that pops the highest integer priority band first, and within a band takes the best
+    lscore from each FLD in turn, so no one site monopolises a band. Requests of an FLD with the same priority and
+    lscore come out in the order they were pushed, with or without JOBDIR.
+    With JOBDIR, pending requests are kept in SQLite instead of downstream_queue_cls queues.
+    Requests for FLDs are dropped as soon as they are blacklisted, and those left in JOBDIR when resuming with changed
+    predicates are dropped too.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler, downstream_queue_cls, key, startprios=()):
+        return cls(crawler, downstream_queue_cls, key, startprios)
+
+    def __init__(self, crawler, downstream_queue_cls, key, startprios=()):
+        self.crawler = crawler
+        self.key = key
+        self.store = _SqliteStore(key, crawler) if key else _MemoryStore()
+        self.bands: dict[int, _Band] = {}
+        # Negated band priorities, possibly including emptied bands
+        self.band_heap: list[int] = []
+        self.size = 0
+        self.seq = 0
+
+        for seq, band, fld, lscore_key in self.store.entries():
+            self._index(seq, band, fld, lscore_key)
+            self.seq = max(self.seq, seq + 1)
+        if self.store.rejected:
+            get_spiders_logger().warning(
+                f"Dropped {self.store.rejected} pending requests scored with other predicates"
+            )
+            if crawler.stats:
+                crawler.stats.inc_value(
+                    "scheduler/rejected/stale_predicates", self.store.rejected
+                )
+
+        crawler.signals.connect(self.purge_fld, signal=fld_blacklisted)
+
+    @staticmethod
+    def lscore_key(request: Request) -> float:
+        # Start URLs have no lscore and come first
+        lscore = request.meta.get("lscore")
+        return -lscore.value if lscore is not None else -inf
+
+    def _index(self, seq: int, priority: int, fld: str, lscore_key: float) -> None:
+        band = self.bands.get(priority)
+        if band is None:
+            band = self.bands[priority] = _Band()
+            heappush(self.band_heap, -priority)
+        band.push(fld, (lscore_key, seq))
+        self.size += 1
+
+    def _top_band(self) -> _Band | None:
+        while self.band_heap:
+            band = self.bands.get(-self.band_heap[0])
+            if band is not None and band.size:
+                return band
+            self.bands.pop(-heappop(self.band_heap), None)
+        return None
+
+    def push(self, request: Request) -> None:
+        fld = request_fld(request)
+        lscore_key = self.lscore_key(request)
+        # Stored first, as it raises ValueError for requests that cannot be serialised
+        self.store.put(self.seq, request.priority, fld, lscore_key, request)
+        self._index(self.seq, request.priority, fld, lscore_key)
+        self.seq += 1
+
+    def pop(self) -> Request | None:
+        band = self._top_band()
+        if band is None:
+            return None
+        _, seq = band.pop()
+        self.size -= 1
+        return self.store.take(seq)
+
+    def peek(self) -> Request | None:
+        band = self._top_band()
+        if band is None:
+            return None
+        _, seq = band.peek()
+        return self.store.get(seq)
+
+    def purge_fld(self, fld: str) -> None:
+        seqs = [seq for band in self.bands.values() for _, seq in band.purge(fld)]
+        if not seqs:
+            return
+        self.store.discard(seqs)
+        self.size -= len(seqs)
+        if self.crawler.stats:
+            self.crawler.stats.inc_value("scheduler/purged/blacklisted", len(seqs))
+
+    def close(self) -> list[int]:
+        self.store.close()
+        return [priority for priority, band in self.bands.items() if band.size]
+
+    def __len__(self) -> int:
+        return self.size
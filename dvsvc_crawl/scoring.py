@@ -0,0 +1,197 @@
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
+
+from scrapy.http.response.html import HtmlResponse
+from scrapy.http.response.text import TextResponse
+from scrapy.linkextractors import LinkExtractor
+
+from dvsvc_crawl.canonical import canonicalise_urls
+from dvsvc_crawl.spiders import get_spiders_logger
+from heuristics import artifacts, dvsvc_scorers
+from heuristics.documents import HtmlDocument
+from heuristics.scorers import LinkScorer, PageScorer, PredicateStats, Score
+
+_PAGE_SCORER: PageScorer | None = None
+_LINK_SCORER: LinkScorer | None = None
+
+
+def get_scorers(artifact_path: str | None = None) -> tuple[PageScorer, LinkScorer]:
+    """
+    Loads the page and link scorers once per process, from a prebuilt artifact if given and up to date.
+    """
+    global _PAGE_SCORER, _LINK_SCORER
+
+    if _PAGE_SCORER is None or _LINK_SCORER is None:
+        if artifact_path:
+            try:
+                _PAGE_SCORER, _LINK_SCORER = artifacts.load_artifact(artifact_path)
+                return _PAGE_SCORER, _LINK_SCORER
+            except (OSError, ValueError) as e:
+                get_spiders_logger().warning(
+                    f"Building scorers from source, as the artifact could not be loaded: {e}"
+                )
+        _PAGE_SCORER = dvsvc_scorers.get_page_scorer()
+        _LINK_SCORER = dvsvc_scorers.get_link_scorer()
+
+    return _PAGE_SCORER, _LINK_SCORER
+
+
+def enable_predicate_stats() -> None:
+    """
+    Records per-predicate statistics in this process's scorers.
+    """
+    page_scorer, link_scorer = get_scorers()
+    page_scorer.stats = page_scorer.stats or PredicateStats()
+    link_scorer.stats = link_scorer.stats or PredicateStats()
+
+
+def _init_worker(artifact_path: str | None, record_stats: bool) -> None:
+    get_scorers(artifact_path)
+    if record_stats:
+        enable_predicate_stats()
+
+
+class ScoredResponse:
+    def __init__(
+        self,
+        pscore: Score,
+        links: list[str],
+        lscores: list[Score],
+        features: tuple[list[bool], int] | None = None,
+        rewritten_links: int = 0,
+        collapsed_links: int = 0,
+    ):
+        self.pscore = pscore
+        self.links = links
+        self.lscores = lscores
+        # Every predicate's match and the word count, if recorded
+        self.features = features
+        # Links changed by canonicalisation, and links dropped as duplicates of others on the page once canonical
+        self.rewritten_links = rewritten_links
+        self.collapsed_links = collapsed_links
+
+
+def score_response(
+    response: TextResponse,
+    thresholds: list[float],
+    pscore: Score | None = None,
+    record_features: bool = False,
+    truncated: bool = False,
+) -> ScoredResponse:
+    """
+    Scores a response and the canonical links extracted from it, reusing a known pscore if given.
+    The pscore is exact unless the page is known to reach no threshold before every predicate is evaluated (see
+    PageScorer.decide()). Such a page is never itemised, and its partial pscore, like its exact one, lies below the
+    lowest threshold, which bounds the parent term of its links' lscores.
+    A truncated response's body has been cut short, e.g. by truncate_body().
+    """
+    page_scorer, link_scorer = get_scorers()
+
+    links, rewritten, collapsed = canonicalise_urls(
+        [link.url for link in LinkExtractor().extract_links(response)]
+    )
+
+    features = None
+    if pscore is None:
+        # Parse once: link extraction reuses the response's cached selector tree
+        document = HtmlDocument(response.selector.root, truncated)
+        if record_features:
+            features = page_scorer.evaluate(document)
+            pscore = page_scorer.score_matches(*features, truncated)
+        else:
+            _, pscore = page_scorer.decide(document, thresholds)
+
+    return ScoredResponse(
+        pscore,
+        links,
+        link_scorer.score_many(links, pscore.value),
+        features,
+        rewritten,
+        collapsed,
+    )
+
+
+def _score_in_worker(
+    response_cls: type[TextResponse],
+    url: str,
+    body: bytes,
+    encoding: str,
+    thresholds: list[float],
+    pscore: Score | None,
+    record_features: bool,
+    truncated: bool,
+) -> tuple[ScoredResponse, dict | None, dict | None]:
+    page_scorer, link_scorer = get_scorers()
+
+    scored = score_response(
+        response_cls(url=url, body=body, encoding=encoding),
+        thresholds,
+        pscore,
+        record_features,
+        truncated,
+    )
+    return (
+        scored,
+        # Statistics are accumulated in the main process
+        page_scorer.stats.drain() if page_scorer.stats else None,
+        link_scorer.stats.drain() if link_scorer.stats else None,
+    )
+
+
+class ScoringPool:
+    """
+    Scores responses in worker processes, each with its own warm scorers, keeping parsing and scoring off the reactor.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        thresholds: list[float],
+        record_features: bool = False,
+        record_stats: bool = False,
+        artifact_path: str | None = None,
+    ):
+        self.thresholds = thresholds
+        self.record_features = record_features
+        # Spawn rather than fork, as forking the reactor's process is unsafe
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(artifact_path, record_stats),
+        )
+
+    async def score(
+        self,
+        url: str,
+        body: bytes,
+        encoding: str,
+        response_cls: type[TextResponse] = HtmlResponse,
+        pscore: Score | None = None,
+        truncated: bool = False,
+    ) -> ScoredResponse:
+        page_scorer, link_scorer = get_scorers()
+
+        scored, page_stats, link_stats = await asyncio.wrap_future(
+            self.executor.submit(
+                _score_in_worker,
+                response_cls,
+                url,
+                body,
+                encoding,
+                self.thresholds,
+                pscore,
+                self.record_features,
+                truncated,
+            )
+        )
+        if page_stats and page_scorer.stats:
+            page_scorer.stats.merge(page_stats)
+        if link_stats and link_scorer.stats:
+            link_scorer.stats.merge(link_stats)
+
+        return scored
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
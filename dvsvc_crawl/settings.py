@@ -1,3 +1,5 @@
+import os
+
 from dvsvc_crawl.pipelines import DvsvcCrawlPipeline
 
 
@@ -10,12 +12,14 @@ ROBOTSTXT_OBEY = False
 
 CONCURRENT_REQUESTS = 50
 
+# The starting delay of each host, adapted by DvsvcPolitenessMiddleware
 DOWNLOAD_DELAY = 5
 
 COOKIES_ENABLED = False
 
 DOWNLOADER_MIDDLEWARES = {
     "dvsvc_crawl.middlewares.DvsvcBlacklistMiddleware": 100,
+    "dvsvc_crawl.middlewares.DvsvcPolitenessMiddleware": 110,
 }
 
 ITEM_PIPELINES = {
@@ -23,13 +27,18 @@ ITEM_PIPELINES = {
 }
 
 REQUEST_FINGERPRINTER_IMPLEMENTATION = "2.7"
+# Deduplicate requests by canonical URL, ignoring scheme, www. and trailing slash differences
+REQUEST_FINGERPRINTER_CLASS = "dvsvc_crawl.canonical.CanonicalRequestFingerprinter"
+# Keep only a Bloom filter of seen requests in memory, confirming its hits against an exact store on disk
+DUPEFILTER_CLASS = "dvsvc_crawl.dupefilters.BloomDupeFilter"
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8"
 
 DEPTH_PRIORITY = 1
 SCHEDULER_DISK_QUEUE = "scrapy.squeues.PickleFifoDiskQueue"
 SCHEDULER_MEMORY_QUEUE = "scrapy.squeues.FifoMemoryQueue"
-SCHEDULER_PRIORITY_QUEUE = "scrapy.pqueues.ScrapyPriorityQueue"
+# Orders requests by lscore within each priority, taking turns between FLDs
+SCHEDULER_PRIORITY_QUEUE = "dvsvc_crawl.pqueues.FldFairPriorityQueue"
 
 REACTOR_THREADPOOL_MAXSIZE = 20
 
@@ -42,3 +51,50 @@ REDIRECT_ENABLED = False
 AJAXCRAWL_ENABLED = True
 
 URLLENGTH_LIMIT = 2048
+
+# Cache of page scores keyed by response body hash, persisted to DVSVC_PSCORE_CACHE_PATH if set (or else to JOBDIR)
+DVSVC_PSCORE_CACHE_SIZE = 100_000
+DVSVC_PSCORE_CACHE_PATH = None
+
+# Processes that parse and score responses off the reactor thread; 0 scores on the reactor thread. Each worker holds
+# its own scorers, so deployments opt in with as many as they have cores and memory to spare
+DVSVC_SCORING_WORKERS = 0
+
+# Bytes of each response body parsed and scored; the rest of larger bodies is ignored, and 0 disables the cap
+DVSVC_MAX_SCORED_BYTES = 2 * 1024 * 1024
+
+# Directory of per-page predicate matches, one file per column, for offline rescoring with heuristics.rescore;
+# disables early page score decisions
+DVSVC_FEATURE_STORE_PATH = None
+
+# Per-predicate calls, matches and evaluation time, exported to the crawler stats and logged with the health metrics
+DVSVC_PREDICATE_STATS = False
+
+# Scorers precompiled by `python -m heuristics.artifacts`, built from source instead if missing or out of date
+DVSVC_SCORER_ARTIFACT_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "resource", "dvsvc_scorers.artifact"
+)
+
+# Links scored below this lscore are never scheduled; None admits every lscore
+DVSVC_FRONTIER_MIN_LSCORE = None
+# Drop links matching a link predicate with a weight of -inf, e.g. an out-of-scope TLD, instead of scheduling them last
+DVSVC_FRONTIER_DROP_OUT_OF_SCOPE = True
+# Regular expressions of links never to schedule
+DVSVC_FRONTIER_DENY_PATTERNS = []
+
+# Requests the duplicate filter's Bloom filter is sized for before it grows, and its false positive rate
+DVSVC_DUPEFILTER_CAPACITY = 1 << 20
+DVSVC_DUPEFILTER_ERROR_RATE = 0.001
+
+# Per-host delay and concurrency adapted to latency and errors, bounded by these, for up to DVSVC_POLITENESS_MAX_HOSTS
+# hosts at a time; concurrency never exceeds CONCURRENT_REQUESTS_PER_DOMAIN
+DVSVC_POLITENESS_ENABLED = True
+DVSVC_POLITENESS_MIN_DELAY = 1.0
+DVSVC_POLITENESS_MAX_DELAY = 60.0
+DVSVC_POLITENESS_MAX_HOSTS = 100_000
+# Responses slower than this many seconds slow their host down
+DVSVC_POLITENESS_SLOW_LATENCY = 5.0
+
+# Visit histories of this many FLDs are kept in memory, and the rest in DVSVC_FLD_HISTORY_PATH (or else JOBDIR)
+DVSVC_FLD_HISTORY_SIZE = 50_000
+DVSVC_FLD_HISTORY_PATH = None
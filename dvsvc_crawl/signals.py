@@ -0,0 +1,2 @@
+# Sent with fld when DvsvcBlacklistMiddleware stops requesting an FLD
+fld_blacklisted = object()
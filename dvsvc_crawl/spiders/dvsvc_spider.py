@@ -1,27 +1,27 @@
 from math import inf
-from scrapy import Request
+from scrapy import Request, signals
 from scrapy.spiders.crawl import CrawlSpider
-from scrapy.linkextractors import LinkExtractor
 from scrapy.http.response.text import TextResponse
 from scrapy.http.response import Response
 
-from expiringdict import ExpiringDict
 from collections import deque
 from datetime import datetime, timezone
-import typing
+import os
+import struct
 
-from dvsvc_crawl import helpers
+from dvsvc_crawl import helpers, scoring
+from dvsvc_crawl.canonical import canonicalise_urls
+from dvsvc_crawl.frontier import Frontier
+from dvsvc_crawl.histories import FLDHistoryStore, item_pscore, pack_item, unpack_item
 from dvsvc_crawl.spiders import get_spiders_logger
 from dvsvc_crawl.items import DvsvcCrawlItem, DvsvcCrawlBatch
-from heuristics import dvsvc_scorers
+from heuristics.caches import ScoreCache
+from heuristics.documents import truncate_body
+from heuristics.features import FeatureStoreWriter
 from heuristics.scorers import Score
 
-
 _LOGGER = get_spiders_logger()
 
-_LINK_SCORER = dvsvc_scorers.get_link_scorer()
-_PAGE_SCORER = dvsvc_scorers.get_page_scorer()
-
 _EXCEPTIONAL_PSCORE = 0.95  # A sufficient pscore to immediately itemise a page
 
 _GOOD_PSCORE = 0.80  # A necessary pscore to consider itemising as part of a page set for the same fld
@@ -30,13 +30,17 @@ _FLD_GOOD_PSCORE_RATIO = (
 )
 _FLD_PSCORE_SAMPLES = 5  # The minimum number of samples needed
 
-# Cache a visit count and good-pscore count for each domain
-# 50,000 domains is more than enough for our scope, especially because pages from high-scoring domains are likely to be visited in quick succession
-_FLD_HISTORIES = ExpiringDict(
-    max_len=50_000, max_age_seconds=60.0 * 60.0 * 24.0  # 24-hour expiry
+# Only the band a pscore falls in matters, so page scoring may stop early once it is known
+_PSCORE_THRESHOLDS = [_GOOD_PSCORE, _EXCEPTIONAL_PSCORE]
+
+_FLD_MAX_CANDIDATES = (
+    16  # The most good pages kept per fld, keeping the highest pscores
 )
 
 _METRIC_OUTPUT_FREQUENCY = 100  # Log health metrics every 100 requests
+_METRIC_SLOWEST_PREDICATES = (
+    5  # Log the time taken by this many of the slowest predicates
+)
 
 
 def lscore_to_prio(lscore: float) -> int:
@@ -56,11 +60,18 @@ def get_response_time(resp: Response) -> datetime:
 
 
 class FLDVisits:
-    good_pages: list[DvsvcCrawlItem]  # We expect the size of this to not increase much
-    total_pages: int
+    """
+    Visit and good-pscore counts for one fld, with its best good pages packed by pack_item().
+    """
+
+    __slots__ = ("good_pages", "good_count", "total_pages")
+
+    _COUNTS = struct.Struct("<III")
+    _LENGTH = struct.Struct("<I")
 
     def __init__(self):
-        self.good_pages = []
+        self.good_pages: list[bytes] = []
+        self.good_count = 0
         self.total_pages = 0
 
     def add_visit(
@@ -74,7 +85,8 @@ class FLDVisits:
         # No need to test URLs for having the same FLD
         self.total_pages += 1
         if pscore.value >= _GOOD_PSCORE:
-            self.good_pages.append(
+            self.good_count += 1
+            record = pack_item(
                 DvsvcCrawlItem(
                     link=link,
                     pscore=pscore,
@@ -83,13 +95,44 @@ class FLDVisits:
                     time_crawled=time_crawled,
                 )
             )
+            if len(self.good_pages) < _FLD_MAX_CANDIDATES:
+                self.good_pages.append(record)
+            else:
+                worst = min(
+                    range(len(self.good_pages)),
+                    key=lambda i: item_pscore(self.good_pages[i]),
+                )
+                if pscore.value > item_pscore(self.good_pages[worst]):
+                    self.good_pages[worst] = record
 
     def has_necessary_fld_ratio(self) -> float:
         return (
             self.total_pages >= _FLD_PSCORE_SAMPLES
-            and len(self.good_pages) / self.total_pages >= _FLD_GOOD_PSCORE_RATIO
+            and self.good_count / self.total_pages >= _FLD_GOOD_PSCORE_RATIO
         )
 
+    def crawl_items(self) -> list[DvsvcCrawlItem]:
+        return [unpack_item(record) for record in self.good_pages]
+
+    def to_bytes(self) -> bytes:
+        return self._COUNTS.pack(
+            self.good_count, self.total_pages, len(self.good_pages)
+        ) + b"".join(
+            self._LENGTH.pack(len(record)) + record for record in self.good_pages
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FLDVisits":
+        visits = cls()
+        visits.good_count, visits.total_pages, count = cls._COUNTS.unpack_from(data)
+        offset = cls._COUNTS.size
+        for _ in range(count):
+            (length,) = cls._LENGTH.unpack_from(data, offset)
+            offset += cls._LENGTH.size
+            visits.good_pages.append(data[offset : offset + length])
+            offset += length
+        return visits
+
 
 class DvsvcSpider(CrawlSpider):
     name = "dvsvc"
@@ -310,8 +353,93 @@ class DvsvcSpider(CrawlSpider):
 
     log_lscores = deque(maxlen=_METRIC_OUTPUT_FREQUENCY)
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+
+        pscore_cache_path = crawler.settings.get("DVSVC_PSCORE_CACHE_PATH")
+        if not pscore_cache_path and crawler.settings.get("JOBDIR"):
+            pscore_cache_path = os.path.join(
+                crawler.settings.get("JOBDIR"), "pscore_cache.pickle"
+            )
+        artifact_path = crawler.settings.get("DVSVC_SCORER_ARTIFACT_PATH")
+        page_scorer, link_scorer = scoring.get_scorers(artifact_path)
+        spider.max_scored_bytes = crawler.settings.getint("DVSVC_MAX_SCORED_BYTES", 0)
+        spider.pscore_cache = ScoreCache(
+            page_scorer.registry,
+            crawler.settings.getint("DVSVC_PSCORE_CACHE_SIZE", 100_000),
+            pscore_cache_path,
+            spider.max_scored_bytes,
+        )
+
+        spider.frontier = Frontier.from_crawler(crawler, link_scorer)
+
+        # Histories of cold flds spill to disk rather than being forgotten
+        fld_history_path = crawler.settings.get("DVSVC_FLD_HISTORY_PATH")
+        if not fld_history_path and crawler.settings.get("JOBDIR"):
+            fld_history_path = os.path.join(
+                crawler.settings.get("JOBDIR"), "fld_histories.sqlite"
+            )
+        spider.fld_histories = FLDHistoryStore(
+            crawler.settings.getint("DVSVC_FLD_HISTORY_SIZE", 50_000),
+            FLDVisits.from_bytes,
+            fld_history_path,
+        )
+        if spider.fld_histories.discarded:
+            _LOGGER.warning(
+                f"Discarded {spider.fld_histories.discarded} FLD histories kept under other predicates"
+            )
+            if crawler.stats:
+                crawler.stats.set_value(
+                    "fld_histories/discarded", spider.fld_histories.discarded
+                )
+
+        # Record every predicate's match per page, to replay scoring with other weights later
+        feature_store_path = crawler.settings.get("DVSVC_FEATURE_STORE_PATH")
+        spider.feature_store = (
+            FeatureStoreWriter(feature_store_path, page_scorer)
+            if feature_store_path
+            else None
+        )
+
+        spider.record_predicate_stats = crawler.settings.getbool(
+            "DVSVC_PREDICATE_STATS"
+        )
+        if spider.record_predicate_stats:
+            scoring.enable_predicate_stats()
+
+        # Score off the reactor thread unless no workers are configured
+        workers = crawler.settings.getint("DVSVC_SCORING_WORKERS", 0)
+        spider.scoring_pool = (
+            scoring.ScoringPool(
+                workers,
+                _PSCORE_THRESHOLDS,
+                record_features=bool(spider.feature_store),
+                record_stats=spider.record_predicate_stats,
+                artifact_path=artifact_path,
+            )
+            if workers > 0
+            else None
+        )
+
+        crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+        return spider
+
+    def spider_closed(self, spider):
+        self.export_predicate_stats()
+        self.pscore_cache.save()
+        self.fld_histories.close()
+        if self.feature_store:
+            self.feature_store.close()
+        if self.scoring_pool:
+            self.scoring_pool.close()
+
     def start_requests(self):
-        for url in self.start_urls:
+        # The seeds include duplicates and ad-click URLs
+        urls, rewritten, collapsed = canonicalise_urls(self.start_urls)
+        self.record_canonicalisation(rewritten, collapsed)
+
+        for url in urls:
             yield Request(
                 url,
                 callback=self.parse,
@@ -319,28 +447,76 @@ class DvsvcSpider(CrawlSpider):
                 meta={"lscore": None, "time_queued": datetime.now(timezone.utc)},
             )
 
-    def parse(self, response):
+    async def parse(self, response):
         if self.crawler.stats:
             self.crawler.stats.inc_value("total_responses")
 
         if not isinstance(response, TextResponse):
             return
 
-        pscore = _PAGE_SCORER.score(response.text)
+        # The same page is often served under several URLs, so only score each body once
+        pscore_cache_key = ScoreCache.content_key(response.body)
+        cached_pscore = self.pscore_cache.get(pscore_cache_key)
 
-        links = list(LinkExtractor().extract_links(response))
+        # Only score the start of giant pages, such as archives and data dumps
+        body, truncated = (
+            truncate_body(response.body, response.encoding, self.max_scored_bytes)
+            if self.max_scored_bytes
+            else (response.body, False)
+        )
+        if truncated and self.crawler.stats:
+            self.crawler.stats.inc_value("scoring/truncated")
+
+        if self.scoring_pool:
+            scored = await self.scoring_pool.score(
+                response.url,
+                body,
+                response.encoding,
+                type(response),
+                cached_pscore,
+                truncated,
+            )
+        else:
+            scored = scoring.score_response(
+                response.replace(body=body) if truncated else response,
+                _PSCORE_THRESHOLDS,
+                cached_pscore,
+                record_features=bool(self.feature_store),
+                truncated=truncated,
+            )
+        pscore = scored.pscore
+        self.record_canonicalisation(scored.rewritten_links, scored.collapsed_links)
+
+        if cached_pscore is None:
+            self.pscore_cache.put(pscore_cache_key, pscore)
+
+        if self.crawler.stats:
+            self.crawler.stats.set_value("pscore_cache/hits", self.pscore_cache.hits)
+            self.crawler.stats.set_value(
+                "pscore_cache/misses", self.pscore_cache.misses
+            )
+            fld_hits, fld_misses = helpers.fld_cache_stats()
+            self.crawler.stats.set_value("fld_cache/hits", fld_hits)
+            self.crawler.stats.set_value("fld_cache/misses", fld_misses)
 
-        for link in links:
-            # Yield new request
-            lscore = _LINK_SCORER.score(link.url, pscore.value)
+        for link, lscore in zip(scored.links, scored.lscores):
+            # Update health metrics
+            self.log_lscores.append(lscore.value)
+
+            if not self.frontier.admit(link, lscore):
+                continue
+
+            # Yield new request, with its FLD for the scheduler and middlewares
             yield Request(
-                link.url,
+                link,
                 callback=self.parse,
                 priority=lscore_to_prio(lscore.value),
-                meta={"lscore": lscore, "time_queued": datetime.now(timezone.utc)},
+                meta={
+                    "lscore": lscore,
+                    "time_queued": datetime.now(timezone.utc),
+                    "fld": helpers.get_fld(link),
+                },
             )
-            # Update health metrics
-            self.log_lscores.append(lscore.value)
 
         # Itemise immediately for exceptional pscore
         if pscore.value >= _EXCEPTIONAL_PSCORE:
@@ -354,10 +530,17 @@ class DvsvcSpider(CrawlSpider):
             _LOGGER.info(f"Itemised page: {response.url}")
 
         # Consider itemising set of pages of the same fld
-        fld = helpers.get_fld(response.url)
-        fld_history = typing.cast(
-            FLDVisits, _FLD_HISTORIES[fld] if fld in _FLD_HISTORIES else FLDVisits()
-        )
+        fld = helpers.request_fld(response)
+
+        if self.feature_store:
+            # Pages with cached pscores only reference the features of the same content
+            self.feature_store.append(
+                response.url, pscore_cache_key, fld, scored.features
+            )
+        fld_history = self.fld_histories.get(fld)
+        if fld_history is None:
+            fld_history = FLDVisits()
+            self.fld_histories.put(fld, fld_history)
         fld_history.add_visit(
             response.url,
             pscore,
@@ -368,16 +551,24 @@ class DvsvcSpider(CrawlSpider):
 
         if fld_history.has_necessary_fld_ratio():
             yield DvsvcCrawlBatch(
-                crawl_items=fld_history.good_pages,
+                crawl_items=fld_history.crawl_items(),
                 time_batched=get_response_time(response),
             )
-            _FLD_HISTORIES.pop(fld)
+            self.fld_histories.pop(fld)
             _LOGGER.info(f"Itemised page set for FLD: {fld}")
-        else:
-            _FLD_HISTORIES[fld] = fld_history
+
+        if self.crawler.stats:
+            self.crawler.stats.set_value(
+                "fld_histories/spilled", self.fld_histories.spilled
+            )
 
         self.log_metrics()
 
+    def record_canonicalisation(self, rewritten: int, collapsed: int) -> None:
+        if self.crawler.stats:
+            self.crawler.stats.inc_value("canonical/rewritten", rewritten)
+            self.crawler.stats.inc_value("canonical/collapsed", collapsed)
+
     def log_metrics(self):
         # Log health metrics every METRIC_OUTPUT_FREQUENCY requests
         if not self.log_lscores or not self.crawler.stats:
@@ -390,3 +581,30 @@ class DvsvcSpider(CrawlSpider):
                 f"Mean lscore value generated from last {_METRIC_OUTPUT_FREQUENCY} responses: {sum(self.log_lscores) / len(self.log_lscores)}"
             )
             _LOGGER.info(f"Queued requests: {len(self.crawler.engine.slot.scheduler)}")
+
+            page_stats = self.export_predicate_stats()
+            slowest = sorted(page_stats, key=lambda item: item[1][2], reverse=True)
+            for name, (calls, matches, seconds) in slowest[:_METRIC_SLOWEST_PREDICATES]:
+                _LOGGER.info(
+                    f"Page predicate {name}: {seconds:.3f}s over {calls} calls, {matches / calls:.1%} matched"
+                )
+
+    def export_predicate_stats(self) -> list[tuple[str, list[float]]]:
+        """
+        Copies the scorers' per-predicate statistics into the crawler stats, returning the page scorer's.
+        """
+        if not self.record_predicate_stats or not self.crawler.stats:
+            return []
+
+        page_scorer, link_scorer = scoring.get_scorers()
+        for kind, scorer in (("page", page_scorer), ("link", link_scorer)):
+            for name, (calls, matches, seconds) in scorer.stats.counters.items():
+                self.crawler.stats.set_value(f"predicates/{kind}/{name}/calls", calls)
+                self.crawler.stats.set_value(
+                    f"predicates/{kind}/{name}/matches", matches
+                )
+                self.crawler.stats.set_value(
+                    f"predicates/{kind}/{name}/time_s", round(seconds, 6)
+                )
+
+        return list(page_scorer.stats.counters.items())
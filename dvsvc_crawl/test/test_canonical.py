@@ -0,0 +1,34 @@
+import pytest
+
+from dvsvc_crawl.canonical import canonicalise_url, url_identity
+
+
+@pytest.mark.parametrize(
+    "url, canonical",
+    [
+        ("HTTPS://Example.org:443/a#top", "https://example.org/a"),
+        ("http://example.org:8080", "http://example.org:8080/"),
+        (
+            "https://example.org/?b=2&a=1&utm_source=x&gclid=y",
+            "https://example.org/?a=1&b=2",
+        ),
+        ("https://example.org/?pk_campaign=x&pk_id=3", "https://example.org/?pk_id=3"),
+        ("https://example.org/?sid=3&page=2", "https://example.org/?page=2&sid=3"),
+        ("https://example.org/?b", "https://example.org/?b"),
+        ("https://example.org/?b=&a&&c=%C3%A9", "https://example.org/?a&b=&c=%C3%A9"),
+        ("https://example.org/p;jsessionid=0AB?q=a+b", "https://example.org/p?q=a+b"),
+        ("https://example.org/p;sid=2", "https://example.org/p;sid=2"),
+        ("mailto:someone@example.org", "mailto:someone@example.org"),
+    ],
+)
+def test_canonicalise_url(url, canonical):
+    assert canonicalise_url(url) == canonical
+
+
+def test_url_identity_collapses_scheme_www_and_trailing_slash():
+    assert url_identity("http://www.example.org/a/?b") == url_identity(
+        "https://example.org/a?b"
+    )
+    assert url_identity("https://example.org/a?b") != url_identity(
+        "https://example.org/a?b="
+    )
@@ -0,0 +1,110 @@
+import os
+
+from scrapy import Request
+from scrapy.utils.test import get_crawler
+
+from dvsvc_crawl.canonical import CanonicalRequestFingerprinter
+from dvsvc_crawl.dupefilters import BloomDupeFilter, ScalableBloomFilter
+
+
+def _keys(prefix: str, count: int) -> list[bytes]:
+    return [f"{prefix}{i}".encode() for i in range(count)]
+
+
+def _dupefilter(path, **kwargs) -> BloomDupeFilter:
+    return BloomDupeFilter(
+        str(path) if path else None,
+        fingerprinter=CanonicalRequestFingerprinter(),
+        stats=get_crawler().stats,
+        **kwargs,
+    )
+
+
+def test_bloom_filter_grows_past_its_capacity():
+    bloom = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+    keys = _keys("added", 1000)
+    for key in keys:
+        bloom.add(key)
+
+    assert len(bloom) == 1000
+    assert [capacity for _, _, _, capacity, _ in bloom.slices] == [
+        100,
+        200,
+        400,
+        800,
+    ]
+    assert all(count <= capacity for _, _, _, capacity, count in bloom.slices)
+    assert all(key in bloom for key in keys)
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = ScalableBloomFilter(initial_capacity=500, error_rate=0.01)
+    for key in _keys("added", 5000):
+        bloom.add(key)
+
+    false_positives = sum(key in bloom for key in _keys("absent", 20_000))
+    assert false_positives / 20_000 <= 0.01
+
+
+def test_bloom_filter_save_and_load(tmp_path):
+    bloom = ScalableBloomFilter(initial_capacity=10)
+    for key in _keys("added", 50):
+        bloom.add(key)
+    bloom.save(str(tmp_path / "seen.bloom"))
+
+    loaded = ScalableBloomFilter.load(str(tmp_path / "seen.bloom"))
+    assert len(loaded) == 50
+    assert all(key in loaded for key in _keys("added", 50))
+
+
+def test_dupefilter_reopens_from_jobdir(tmp_path):
+    dupefilter = _dupefilter(tmp_path, initial_capacity=10)
+    assert not any(
+        dupefilter.request_seen(Request(f"https://example.org/{i}")) for i in range(100)
+    )
+    # Canonically the same URLs
+    assert all(
+        dupefilter.request_seen(Request(f"https://www.example.org/{i}/"))
+        for i in range(100)
+    )
+    dupefilter.close("finished")
+
+    dupefilter = _dupefilter(tmp_path, initial_capacity=10)
+    assert len(dupefilter.bloom) == 100
+    assert all(
+        dupefilter.request_seen(Request(f"https://example.org/{i}")) for i in range(100)
+    )
+    assert not dupefilter.request_seen(Request("https://example.org/new"))
+    dupefilter.close("finished")
+
+
+def test_dupefilter_rebuilds_missing_bloom_filter_from_sqlite(tmp_path):
+    dupefilter = _dupefilter(tmp_path)
+    for i in range(20):
+        dupefilter.request_seen(Request(f"https://example.org/{i}"))
+    dupefilter.close("finished")
+    os.remove(tmp_path / "requests.seen.bloom")
+
+    dupefilter = _dupefilter(tmp_path)
+    assert len(dupefilter.bloom) == 20
+    assert dupefilter.request_seen(Request("https://example.org/3"))
+    dupefilter.close("finished")
+
+
+def test_dupefilter_confirms_false_positives(tmp_path):
+    dupefilter = _dupefilter(tmp_path, initial_capacity=10)
+    # With every bit set, the filter claims to have seen any request
+    dupefilter.bloom.slices[0][0][:] = b"\xff" * len(dupefilter.bloom.slices[0][0])
+
+    assert not dupefilter.request_seen(Request("https://example.org/"))
+    assert dupefilter.request_seen(Request("https://example.org/"))
+    assert dupefilter.stats.get_value("dupefilter/bloom_false_positives") == 1
+    dupefilter.close("finished")
+
+
+def test_dupefilter_without_jobdir_removes_its_store():
+    dupefilter = _dupefilter(None)
+    dupefilter.request_seen(Request("https://example.org/"))
+    dupefilter.close("finished")
+
+    assert not os.path.exists(dupefilter.db_path)
@@ -0,0 +1,92 @@
+from math import inf
+
+import pytest
+from scrapy.utils.test import get_crawler
+
+from dvsvc_crawl.frontier import Frontier
+from dvsvc_crawl.signals import fld_blacklisted
+from heuristics.scorers import LinkScorer, RegexPredicate
+
+
+def _link_scorer() -> LinkScorer:
+    return LinkScorer(
+        0.9,
+        0.5,
+        [
+            RegexPredicate({r"\.gov($|/)"}, constant_weight=-inf, alias="GOV"),
+            RegexPredicate({"help"}, constant_weight=1.0, alias="HELP"),
+            RegexPredicate({"news"}, constant_weight=-1.0, alias="NEWS"),
+        ],
+        registry="test-frontier",
+    )
+
+
+def _frontier(**settings) -> Frontier:
+    crawler = get_crawler(settings_dict=settings)
+    crawler.stats.open_spider(None)
+    return Frontier.from_crawler(crawler, _link_scorer())
+
+
+@pytest.mark.parametrize(
+    "link, reason",
+    [
+        ("https://example.org/help", None),
+        ("https://example.org/news", "low_lscore"),
+        ("https://example.gov/help", "out_of_scope"),
+        ("ftp://example.org/help", "scheme"),
+        ("https://example.org/help/login", "denied"),
+        ("https://bbc.com/help", "blacklisted"),
+        ("https://localhost/help", "no_fld"),
+        # Out of scope links are dropped as such, however else they would be
+        ("https://example.gov/news/login", "out_of_scope"),
+        ("ftp://example.org/news", "low_lscore"),
+        ("mailto:help@localhost", "scheme"),
+    ],
+)
+def test_rejection_reasons(link, reason):
+    frontier = _frontier(
+        DVSVC_FRONTIER_MIN_LSCORE=0.0, DVSVC_FRONTIER_DENY_PATTERNS=["/login"]
+    )
+    link_scorer = _link_scorer()
+    assert frontier.rejection(link, link_scorer.score(link, 0.5)) == reason
+
+
+def test_out_of_scope_links_can_be_kept():
+    frontier = _frontier(DVSVC_FRONTIER_DROP_OUT_OF_SCOPE=False)
+    link = "https://example.gov/help"
+    assert frontier.rejection(link, _link_scorer().score(link, 0.5)) is None
+
+
+def test_drops_are_counted_per_reason():
+    frontier = _frontier(DVSVC_FRONTIER_MIN_LSCORE=0.0)
+    link_scorer = _link_scorer()
+    links = [
+        "https://example.org/help",
+        "https://example.org/help/2",
+        "https://example.org/news",
+        "https://example.gov/help",
+    ]
+    admitted = [
+        link for link in links if frontier.admit(link, link_scorer.score(link, 0.5))
+    ]
+
+    assert admitted == links[:2]
+    assert frontier.stats.get_stats() == {
+        "frontier/admitted": 2,
+        "frontier/dropped/low_lscore": 1,
+        "frontier/dropped/out_of_scope": 1,
+    }
+
+
+def test_blacklisted_flds_are_dropped_once_signalled():
+    crawler = get_crawler()
+    crawler.stats.open_spider(None)
+    frontier = Frontier.from_crawler(crawler, _link_scorer())
+    link = "https://www.example.org/help"
+    lscore = _link_scorer().score(link, 0.5)
+    assert frontier.admit(link, lscore)
+
+    crawler.signals.send_catch_log(fld_blacklisted, fld="example.org")
+    assert not frontier.admit(link, lscore)
+    assert frontier.admit("https://example.com/help", lscore)
+    assert crawler.stats.get_value("frontier/dropped/blacklisted") == 1
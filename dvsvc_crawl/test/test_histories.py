@@ -0,0 +1,141 @@
+from datetime import datetime, timezone
+import os
+
+import pytest
+
+from dvsvc_crawl.histories import FLDHistoryStore, item_pscore, pack_item, unpack_item
+from dvsvc_crawl.items import DvsvcCrawlItem
+from heuristics.scorers import KeywordPredicate, Score, register_predicates
+
+
+class _Counter:
+    def __init__(self, count: int = 0):
+        self.count = count
+
+    def to_bytes(self) -> bytes:
+        return self.count.to_bytes(4, "little")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "_Counter":
+        return cls(int.from_bytes(data, "little"))
+
+
+def test_store_creates_missing_directory(tmp_path):
+    path = os.path.join(tmp_path, "new_jobdir", "fld_histories.sqlite")
+
+    store = FLDHistoryStore(10, _Counter.from_bytes, path)
+    store.put("example.org", _Counter(3))
+    store.close()
+
+    assert os.path.exists(path)
+
+
+def _fields(score: Score | None) -> tuple | None:
+    if score is None:
+        return None
+    return score.value, score.mask, score.registry, score.truncated
+
+
+@pytest.mark.parametrize(
+    "item",
+    [
+        DvsvcCrawlItem(
+            link="https://example.org/héllo?q=1",
+            pscore=Score(0.91, (1 << 70) | 5, "page", True),
+            lscore=Score(-0.25, 3, "link"),
+            time_queued=datetime(2024, 3, 9, 12, 30, 1, 250, tzinfo=timezone.utc),
+            time_crawled=datetime(2024, 3, 9, 12, 31, 2, 999_999, tzinfo=timezone.utc),
+        ),
+        DvsvcCrawlItem(
+            link="https://example.org/",
+            pscore=Score(0.8),
+            lscore=None,
+            time_queued=datetime(1969, 12, 31, 23, 59, 59),
+            time_crawled=datetime(2024, 3, 9),
+        ),
+    ],
+)
+def test_pack_item_round_trip(item):
+    record = pack_item(item)
+    unpacked = unpack_item(record)
+
+    assert item_pscore(record) == item["pscore"].value
+    assert unpacked["link"] == item["link"]
+    assert _fields(unpacked["pscore"]) == _fields(item["pscore"])
+    assert _fields(unpacked["lscore"]) == _fields(item["lscore"])
+    assert unpacked["time_queued"] == item["time_queued"]
+    assert unpacked["time_crawled"] == item["time_crawled"]
+    assert unpacked["time_queued"].tzinfo == item["time_queued"].tzinfo
+
+
+def test_store_spills_least_recently_used_to_sqlite(tmp_path):
+    store = FLDHistoryStore(2, _Counter.from_bytes, str(tmp_path / "histories.sqlite"))
+    store.put("a.org", _Counter(1))
+    store.put("b.org", _Counter(2))
+    store.get("a.org")
+    store.put("c.org", _Counter(3))
+
+    assert store.spilled == 1
+    assert "b.org" not in store
+    assert store.get("b.org").count == 2
+    assert "b.org" in store
+    assert store.spilled == 2
+    assert store.get("missing.org") is None
+
+    store.pop("b.org")
+    store.put("d.org", _Counter(4))
+    store.put("e.org", _Counter(5))
+    assert store.get("b.org") is None
+    store.close()
+
+
+def test_store_reloads_after_restart(tmp_path):
+    path = str(tmp_path / "histories.sqlite")
+    store = FLDHistoryStore(2, _Counter.from_bytes, path)
+    for i in range(5):
+        store.put(f"{i}.org", _Counter(i))
+    store.get("0.org").count += 10
+    store.pop("1.org")
+    store.close()
+
+    store = FLDHistoryStore(2, _Counter.from_bytes, path)
+    assert len(store) == 0
+    assert store.get("0.org").count == 10
+    assert store.get("1.org") is None
+    assert [store.get(f"{i}.org").count for i in range(2, 5)] == [2, 3, 4]
+    store.close()
+
+
+def test_temporary_store_is_removed_on_close():
+    store = FLDHistoryStore(1, _Counter.from_bytes)
+    store.put("a.org", _Counter(1))
+    store.put("b.org", _Counter(2))
+    assert store.get("a.org").count == 1
+    store.close()
+
+    assert not os.path.exists(store.path)
+
+
+def test_store_discards_histories_kept_under_other_predicates(tmp_path):
+    path = str(tmp_path / "histories.sqlite")
+    register_predicates("test-histories", [KeywordPredicate({"refuge"})])
+    store = FLDHistoryStore(2, _Counter.from_bytes, path)
+    store.put("a.org", _Counter(1))
+    store.close()
+
+    store = FLDHistoryStore(2, _Counter.from_bytes, path)
+    assert store.discarded == 0
+    assert store.get("a.org").count == 1
+    store.close()
+
+    register_predicates("test-histories", [KeywordPredicate({"shelter"}, alias="NEW")])
+    store = FLDHistoryStore(2, _Counter.from_bytes, path)
+    assert store.discarded == 1
+    assert store.get("a.org") is None
+    store.put("b.org", _Counter(2))
+    store.close()
+
+    store = FLDHistoryStore(2, _Counter.from_bytes, path)
+    assert store.discarded == 0
+    assert store.get("b.org").count == 2
+    store.close()
@@ -0,0 +1,85 @@
+from scrapy import Request
+from scrapy.core.downloader import Slot
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from dvsvc_crawl.middlewares import DvsvcPolitenessMiddleware
+
+
+class _Downloader:
+    def __init__(self):
+        self.slots = {}
+        self.per_slot_settings = {}
+
+
+class _Engine:
+    def __init__(self):
+        self.downloader = _Downloader()
+
+
+def _middleware(**settings) -> DvsvcPolitenessMiddleware:
+    crawler = get_crawler(
+        settings_dict={
+            "DVSVC_POLITENESS_ENABLED": True,
+            "DOWNLOAD_DELAY": 1.0,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": 8,
+            **settings,
+        }
+    )
+    crawler.engine = _Engine()
+    return DvsvcPolitenessMiddleware.from_crawler(crawler)
+
+
+def _respond(middleware, host: str, status: int = 200, latency: float = 0.1, **kwargs):
+    request = Request(
+        f"https://{host}/", meta={"download_slot": host, "download_latency": latency}
+    )
+    middleware.process_response(
+        request, Response(request.url, status=status, **kwargs), None
+    )
+
+
+def test_errors_slow_a_host_down_and_recovery_restores_it():
+    middleware = _middleware()
+    slot = middleware.crawler.engine.downloader.slots["a.org"] = Slot(8, 1.0, False)
+
+    _respond(middleware, "a.org", 503, headers={"Retry-After": "30"})
+    assert (slot.delay, slot.concurrency) == (30.0, 4)
+    _respond(middleware, "a.org", latency=9.0)
+    assert (slot.delay, slot.concurrency) == (60.0, 2)
+    assert middleware.crawler.stats.get_value("politeness/hosts") == {
+        "a.org": {"delay": 60.0, "concurrency": 2, "errors": 1}
+    }
+
+    for _ in range(100):
+        _respond(middleware, "a.org")
+    assert (slot.delay, slot.concurrency) == (1.0, 8)
+    assert middleware.crawler.stats.get_value("politeness/hosts") == {}
+    assert middleware.crawler.stats.get_value("politeness/backoff/error") == 1
+    assert middleware.crawler.stats.get_value("politeness/backoff/slow") == 1
+
+
+def test_idle_slots_are_recreated_as_left():
+    middleware = _middleware()
+    _respond(middleware, "a.org", 429)
+
+    assert middleware.crawler.engine.downloader.per_slot_settings["a.org"] == {
+        "delay": 2.0,
+        "concurrency": 4,
+    }
+
+
+def test_hosts_are_bounded():
+    middleware = _middleware(DVSVC_POLITENESS_MAX_HOSTS=2)
+    for host in ("a.org", "b.org", "c.org"):
+        _respond(middleware, host, 500)
+
+    assert list(middleware.hosts.entries) == ["b.org", "c.org"]
+    assert set(middleware.crawler.engine.downloader.per_slot_settings) == {
+        "b.org",
+        "c.org",
+    }
+    assert set(middleware.crawler.stats.get_value("politeness/hosts")) == {
+        "b.org",
+        "c.org",
+    }
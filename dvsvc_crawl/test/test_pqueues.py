@@ -0,0 +1,141 @@
+import pytest
+from scrapy import Request
+from scrapy.utils.test import get_crawler
+
+from dvsvc_crawl.pqueues import FldFairPriorityQueue
+from dvsvc_crawl.signals import fld_blacklisted
+from heuristics.scorers import KeywordPredicate, Score, register_predicates
+
+
+@pytest.fixture(params=["memory", "jobdir"])
+def key(request, tmp_path) -> str:
+    return str(tmp_path) if request.param == "jobdir" else ""
+
+
+def _request(url: str, priority: int = 0, lscore: float | None = 0.5) -> Request:
+    return Request(
+        url,
+        priority=priority,
+        meta={"lscore": Score(lscore)} if lscore is not None else {},
+    )
+
+
+def _pop_all(queue: FldFairPriorityQueue) -> list[str]:
+    urls = []
+    while (request := queue.pop()) is not None:
+        urls.append(request.url)
+    return urls
+
+
+def test_higher_bands_first(key):
+    crawler = get_crawler()
+    queue = FldFairPriorityQueue.from_crawler(crawler, None, key)
+    queue.push(_request("https://a.org/low", priority=1, lscore=0.9))
+    queue.push(_request("https://a.org/high", priority=5, lscore=0.1))
+    queue.push(_request("https://b.org/middle", priority=3))
+
+    assert len(queue) == 3
+    assert queue.peek().url == "https://a.org/high"
+    assert _pop_all(queue) == [
+        "https://a.org/high",
+        "https://b.org/middle",
+        "https://a.org/low",
+    ]
+    assert len(queue) == 0
+    queue.close()
+
+
+def test_flds_take_turns_within_a_band(key):
+    crawler = get_crawler()
+    queue = FldFairPriorityQueue.from_crawler(crawler, None, key)
+    for lscore in (0.1, 0.9, 0.5):
+        queue.push(_request(f"https://www.big.org/{lscore}", lscore=lscore))
+    queue.push(_request("https://small.org/", lscore=0.2))
+    queue.push(_request("https://seed.org/", lscore=None))
+
+    assert _pop_all(queue) == [
+        "https://www.big.org/0.9",
+        "https://small.org/",
+        "https://seed.org/",
+        "https://www.big.org/0.5",
+        "https://www.big.org/0.1",
+    ]
+    queue.close()
+
+
+def test_equal_keys_are_first_in_first_out(key):
+    crawler = get_crawler()
+    queue = FldFairPriorityQueue.from_crawler(crawler, None, key)
+    urls = [f"https://a.org/{i}" for i in range(10)]
+    for url in urls:
+        queue.push(_request(url))
+
+    assert _pop_all(queue) == urls
+    queue.close()
+
+
+def test_resumes_from_jobdir(tmp_path):
+    crawler = get_crawler()
+    queue = FldFairPriorityQueue.from_crawler(crawler, None, str(tmp_path))
+    for i in range(6):
+        queue.push(_request(f"https://a.org/{i}", priority=i % 2, lscore=i / 10))
+    queue.push(_request("https://b.org/", priority=1))
+    assert queue.pop().url == "https://a.org/5"
+    assert queue.close() == [0, 1]
+
+    queue = FldFairPriorityQueue.from_crawler(crawler, None, str(tmp_path), [0, 1])
+    assert len(queue) == 6
+    queue.push(_request("https://c.org/", priority=1, lscore=0.0))
+    assert _pop_all(queue) == [
+        "https://a.org/3",
+        "https://b.org/",
+        "https://c.org/",
+        "https://a.org/1",
+        "https://a.org/4",
+        "https://a.org/2",
+        "https://a.org/0",
+    ]
+    queue.close()
+
+
+def test_purges_blacklisted_fld(key):
+    crawler = get_crawler()
+    queue = FldFairPriorityQueue.from_crawler(crawler, None, key)
+    for i in range(3):
+        queue.push(_request(f"https://bad.org/{i}", priority=i))
+        queue.push(_request(f"https://good.org/{i}", priority=i))
+
+    crawler.signals.send_catch_log(fld_blacklisted, fld="bad.org")
+
+    assert len(queue) == 3
+    assert crawler.stats.get_value("scheduler/purged/blacklisted") == 3
+    assert _pop_all(queue) == [f"https://good.org/{i}" for i in (2, 1, 0)]
+    queue.close()
+
+    if key:
+        queue = FldFairPriorityQueue.from_crawler(crawler, None, key)
+        assert len(queue) == 0
+        queue.close()
+
+
+def test_rejects_requests_stored_under_other_predicates(tmp_path):
+    crawler = get_crawler()
+    register_predicates("test-pqueues", [KeywordPredicate({"refuge"})])
+    queue = FldFairPriorityQueue.from_crawler(crawler, None, str(tmp_path))
+    queue.push(_request("https://a.org/"))
+    queue.close()
+
+    queue = FldFairPriorityQueue.from_crawler(crawler, None, str(tmp_path))
+    assert len(queue) == 1
+    queue.close()
+
+    register_predicates("test-pqueues", [KeywordPredicate({"shelter"}, alias="NEW")])
+    queue = FldFairPriorityQueue.from_crawler(crawler, None, str(tmp_path))
+    assert len(queue) == 0
+    assert crawler.stats.get_value("scheduler/rejected/stale_predicates") == 1
+    queue.push(_request("https://b.org/"))
+    queue.close()
+
+    queue = FldFairPriorityQueue.from_crawler(crawler, None, str(tmp_path))
+    assert _pop_all(queue) == ["https://b.org/"]
+    queue.close()
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from scrapy.http import HtmlResponse
+
+from dvsvc_crawl import scoring
+
+_THRESHOLDS = [0.8, 0.95]
+_LOW_PAGE = (
+    "<html><body><p>Read our privacy policy and cookies.</p>"
+    "<a href='/news'>News</a><a href='/news#top'>Top</a></body></html>"
+)
+_HIGH_PAGE = (
+    "<html><head><title>Women's Aid domestic abuse helpline</title></head><body>"
+    "<p>Domestic abuse support: call our free, confidential 24 hour helpline on 0808 2000 247. Refuge for women "
+    "and children experiencing domestic violence, coercive control, stalking and sexual violence.</p>"
+    "<button onclick=\"window.location='https://bbc.co.uk'\">Quick exit</button>"
+    "<a href='https://womensaid.org.uk/get-help?utm_source=x'>Get help</a></body></html>"
+)
+
+
+def _response(page_html: str) -> HtmlResponse:
+    return HtmlResponse(
+        url="https://example.org/", body=page_html.encode(), encoding="utf8"
+    )
+
+
+def test_pages_with_links_in_band_0_are_decided_early(monkeypatch):
+    page_scorer, link_scorer = scoring.get_scorers()
+    band, decided = page_scorer.decide(_LOW_PAGE, _THRESHOLDS)
+    assert band == 0
+
+    def evaluate(*args):
+        raise AssertionError("Every predicate evaluated")
+
+    monkeypatch.setattr(page_scorer, "evaluate", evaluate)
+    scored = scoring.score_response(_response(_LOW_PAGE), _THRESHOLDS)
+
+    assert scored.links == ["https://example.org/news"]
+    assert scored.collapsed_links == 1
+    assert (scored.pscore.value, scored.pscore.mask) == (decided.value, decided.mask)
+    assert [s.value for s in scored.lscores] == [
+        s.value for s in link_scorer.score_many(scored.links, decided.value)
+    ]
+
+
+def test_pages_reaching_a_threshold_are_scored_exactly():
+    page_scorer, link_scorer = scoring.get_scorers()
+    scored = scoring.score_response(_response(_HIGH_PAGE), _THRESHOLDS)
+    score = page_scorer.score(_HIGH_PAGE)
+
+    assert scored.pscore.value >= _THRESHOLDS[0]
+    assert (scored.pscore.value, scored.pscore.mask) == (score.value, score.mask)
+    assert scored.links == ["https://womensaid.org.uk/get-help"]
+    assert scored.rewritten_links == 1
+    assert [s.value for s in scored.lscores] == [
+        s.value for s in link_scorer.score_many(scored.links, score.value)
+    ]
+
+
+@pytest.mark.parametrize("page_html", [_LOW_PAGE, _HIGH_PAGE])
+def test_recorded_features_score_exactly(page_html):
+    page_scorer, _ = scoring.get_scorers()
+    scored = scoring.score_response(
+        _response(page_html), _THRESHOLDS, record_features=True
+    )
+
+    assert scored.features == page_scorer.evaluate(page_html)
+    assert scored.pscore.value == page_scorer.score(page_html).value
+
+
+class _UnreadableResponse(HtmlResponse):
+    def __init__(self, *args, **kwargs):
+        raise ValueError("Unreadable response")
+
+
+def test_pool_scores_as_inline():
+    expected = [
+        scoring.score_response(_response(page_html), _THRESHOLDS)
+        for page_html in (_LOW_PAGE, _HIGH_PAGE)
+    ]
+
+    async def score_all():
+        pool = scoring.ScoringPool(2, _THRESHOLDS)
+        try:
+            return await asyncio.gather(
+                *(
+                    pool.score("https://example.org/", page_html.encode(), "utf8")
+                    for page_html in (_LOW_PAGE, _HIGH_PAGE)
+                )
+            )
+        finally:
+            pool.close()
+
+    for scored, inline in zip(asyncio.run(score_all()), expected):
+        assert (scored.pscore.value, scored.pscore.mask) == (
+            inline.pscore.value,
+            inline.pscore.mask,
+        )
+        assert scored.pscore.registry == inline.pscore.registry
+        assert scored.links == inline.links
+        assert [s.value for s in scored.lscores] == [s.value for s in inline.lscores]
+        assert (scored.rewritten_links, scored.collapsed_links) == (
+            inline.rewritten_links,
+            inline.collapsed_links,
+        )
+
+
+def test_pool_worker_errors_are_raised_to_the_caller():
+    async def score():
+        pool = scoring.ScoringPool(1, _THRESHOLDS)
+        try:
+            with pytest.raises(ValueError, match="Unreadable response"):
+                await pool.score(
+                    "https://example.org/", b"", "utf8", _UnreadableResponse
+                )
+            # The worker survives and scores the next response
+            return await pool.score("https://example.org/", _HIGH_PAGE.encode(), "utf8")
+        finally:
+            pool.close()
+
+    assert asyncio.run(score()).pscore.value >= _THRESHOLDS[0]
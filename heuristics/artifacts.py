@@ -0,0 +1,142 @@
+"""
+Precompiles the page and link scorers into a versioned artifact, e.g.
+
+    python -m heuristics.artifacts resource/dvsvc_scorers.artifact
+
+Loading unpickles the scorers with their automata's arrays as views of the memory-mapped file, so processes skip
+reading the charities register and building automata, and share the arrays' pages rather than each holding a copy.
+"""
+
+from array import array
+import argparse
+import hashlib
+import io
+import mmap
+import os
+import pickle
+import struct
+
+from heuristics import automata, dvsvc_scorers, helpers, scorers
+from heuristics.scorers import LinkScorer, PageScorer
+
+_MAGIC = b"DVSVCSA\0"
+_VERSION = 1
+# Magic, version, fingerprint, pickle length and sections offset
+_HEADER = struct.Struct("<8sI32sQQ")
+_SECTION_ALIGNMENT = 64
+# Smaller arrays are pickled inline
+_MIN_SECTION_BYTES = 4096
+
+DEFAULT_ARTIFACT_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..", "resource", "dvsvc_scorers.artifact")
+)
+
+
+def source_fingerprint() -> bytes:
+    """
+    Digest of everything the scorers are built from, so artifacts built from other sources are rejected.
+    """
+    digest = hashlib.blake2b(str(_VERSION).encode(), digest_size=32)
+    for module in (automata, dvsvc_scorers, helpers, scorers):
+        with open(module.__file__, "rb") as file:
+            digest.update(file.read())
+    with open(dvsvc_scorers.__SCOT_CHARITIES_PATH, "rb") as file:
+        digest.update(file.read())
+    return digest.digest()
+
+
+class _SectionPickler(pickle.Pickler):
+    def __init__(self, file, sections: io.BytesIO):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.sections = sections
+
+    def persistent_id(self, obj):
+        if type(obj) is not array or obj.itemsize * len(obj) < _MIN_SECTION_BYTES:
+            return None
+        padding = -self.sections.tell() % _SECTION_ALIGNMENT
+        self.sections.write(b"\0" * padding)
+        offset = self.sections.tell()
+        self.sections.write(obj.tobytes())
+        return ("array", obj.typecode, offset, len(obj))
+
+
+class _SectionUnpickler(pickle.Unpickler):
+    def __init__(self, file, sections: memoryview):
+        super().__init__(file)
+        self.sections = sections
+
+    def persistent_load(self, pid):
+        kind, typecode, offset, length = pid
+        if kind != "array":
+            raise pickle.UnpicklingError(f"Unknown section kind: {kind}")
+        itemsize = array(typecode).itemsize
+        return self.sections[offset : offset + length * itemsize].cast(typecode)
+
+
+def build_artifact(path: str) -> None:
+    page_scorer = dvsvc_scorers.get_page_scorer()
+    link_scorer = dvsvc_scorers.get_link_scorer()
+
+    pickled = io.BytesIO()
+    sections = io.BytesIO()
+    _SectionPickler(pickled, sections).dump((page_scorer, link_scorer))
+
+    sections_offset = _HEADER.size + len(pickled.getbuffer())
+    sections_offset += -sections_offset % _SECTION_ALIGNMENT
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(
+            _HEADER.pack(
+                _MAGIC,
+                _VERSION,
+                source_fingerprint(),
+                len(pickled.getbuffer()),
+                sections_offset,
+            )
+        )
+        file.write(pickled.getbuffer())
+        file.write(b"\0" * (sections_offset - file.tell()))
+        file.write(sections.getbuffer())
+    os.replace(temp_path, path)
+
+
+def load_artifact(path: str) -> tuple[PageScorer, LinkScorer]:
+    """
+    Loads the scorers from an artifact, raising ValueError if it is malformed or was built from other sources.
+    """
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapped) < _HEADER.size:
+        raise ValueError(f"Not a scorer artifact: {path}")
+    magic, version, fingerprint, pickle_length, sections_offset = _HEADER.unpack(
+        mapped[: _HEADER.size]
+    )
+    if magic != _MAGIC:
+        raise ValueError(f"Not a scorer artifact: {path}")
+    if version != _VERSION:
+        raise ValueError(f"Unsupported scorer artifact version: {version}")
+    if fingerprint != source_fingerprint():
+        raise ValueError(f"Scorer artifact {path} is out of date with its sources")
+
+    # The views keep the mapping open for as long as the scorers use them
+    view = memoryview(mapped)
+    page_scorer, link_scorer = _SectionUnpickler(
+        io.BytesIO(view[_HEADER.size : _HEADER.size + pickle_length]),
+        view[sections_offset:],
+    ).load()
+    return page_scorer, link_scorer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", default=DEFAULT_ARTIFACT_PATH)
+    args = parser.parse_args()
+
+    build_artifact(args.path)
+    print("Built scorer artifact:", args.path, os.path.getsize(args.path), "bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Hashable, Iterable, Iterator, Sequence
+
+
+class PhraseAutomaton:
+    """
+    Aho-Corasick automaton over sequences of symbols, e.g. the words or the characters of each phrase.
+    Once built, transitions are stored as flat arrays sorted by symbol id, one slice per state.
+    """
+
+    def __init__(self, phrases: Iterable[Sequence[Hashable]]):
+        self.symbols: dict[Hashable, int] = {}
+        goto: list[dict[int, int]] = [{}]
+        outputs = [-1]
+
+        for phrase_index, phrase in enumerate(phrases):
+            state = 0
+            for symbol in phrase:
+                symbol_id = self.symbols.setdefault(symbol, len(self.symbols))
+                next_state = goto[state].get(symbol_id)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][symbol_id] = next_state
+                    goto.append({})
+                    outputs.append(-1)
+                state = next_state
+            # Empty phrases never match; duplicate phrases report their first occurrence
+            if state != 0 and outputs[state] == -1:
+                outputs[state] = phrase_index
+
+        self.edge_offsets = array("i", [0])
+        self.edge_symbols = array("i")
+        self.edge_targets = array("i")
+        for edges in goto:
+            for symbol_id in sorted(edges):
+                self.edge_symbols.append(symbol_id)
+                self.edge_targets.append(edges[symbol_id])
+            self.edge_offsets.append(len(self.edge_symbols))
+
+        self.outputs = array("i", outputs)
+        self.fail = array("i", [0] * len(goto))
+        # Nearest state along the failure chain with an output, or -1
+        self.output_links = array("i", [-1] * len(goto))
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol_id, next_state in goto[state].items():
+                fallback = self.fail[state]
+                while True:
+                    target = self._goto(fallback, symbol_id)
+                    if target != -1 or fallback == 0:
+                        break
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = target if target != -1 else 0
+
+                fail_state = self.fail[next_state]
+                self.output_links[next_state] = (
+                    fail_state
+                    if self.outputs[fail_state] != -1
+                    else self.output_links[fail_state]
+                )
+                queue.append(next_state)
+
+    def __len__(self) -> int:
+        return len(self.outputs)
+
+    def _goto(self, state: int, symbol_id: int) -> int:
+        lo = self.edge_offsets[state]
+        hi = self.edge_offsets[state + 1]
+        i = bisect_left(self.edge_symbols, symbol_id, lo, hi)
+        if i < hi and self.edge_symbols[i] == symbol_id:
+            return self.edge_targets[i]
+        return -1
+
+    def _step(self, state: int, symbol: Hashable) -> int:
+        symbol_id = self.symbols.get(symbol)
+        if symbol_id is None:
+            # No phrase contains this symbol, so no match can span it
+            return 0
+        while True:
+            next_state = self._goto(state, symbol_id)
+            if next_state != -1:
+                return next_state
+            if state == 0:
+                return 0
+            state = self.fail[state]
+
+    def iter_matches(self, symbols: Iterable[Hashable]) -> Iterator[int]:
+        """
+        Yields the index of every phrase occurrence in a single pass over the symbols.
+        """
+        state = 0
+        for symbol in symbols:
+            state = self._step(state, symbol)
+            match = state if self.outputs[state] != -1 else self.output_links[state]
+            while match != -1:
+                yield self.outputs[match]
+                match = self.output_links[match]
+
+    def search(self, symbols: Iterable[Hashable]) -> bool:
+        """
+        Returns whether any phrase occurs, stopping at the first occurrence.
+        """
+        state = 0
+        for symbol in symbols:
+            state = self._step(state, symbol)
+            if self.outputs[state] != -1 or self.output_links[state] != -1:
+                return True
+        return False
@@ -0,0 +1,91 @@
+from typing import Iterable
+import numpy as np
+
+from heuristics.documents import HtmlDocument
+from heuristics.scorers import PageScorer
+
+
+def predicate_matrix(
+    scorer: PageScorer, pages: Iterable[str | HtmlDocument]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluates a scorer's predicates on each page, giving an N x P boolean match matrix and the N word counts.
+    """
+    rows = []
+    word_counts = []
+    for page in pages:
+        matches, word_count = scorer.evaluate(page)
+        rows.append(matches)
+        word_counts.append(word_count)
+
+    return (
+        np.array(rows, dtype=bool).reshape(len(rows), len(scorer.predicates)),
+        np.array(word_counts, dtype=np.int64),
+    )
+
+
+def scorer_weights(scorer: PageScorer) -> tuple[np.ndarray, np.ndarray]:
+    return (
+        np.array([p.constant_weight for p in scorer.predicates], dtype=np.float64),
+        np.array([p.scaling_weight for p in scorer.predicates], dtype=np.float64),
+    )
+
+
+def logistic00_array(
+    x: np.ndarray, fit_to_point: tuple[float, float] = (1.0, np.e / (np.e + 1.0))
+) -> np.ndarray:
+    """
+    Element-wise heuristics.helpers.logistic00.
+    """
+    if abs(fit_to_point[1]) >= 1:
+        raise ValueError(
+            "The second value of fit_to_point must be strictly between 0 and 1"
+        )
+    a = -np.log((1 - fit_to_point[1]) / (1 + fit_to_point[1])) / fit_to_point[0]
+    with np.errstate(over="ignore"):
+        return 2 / (1 + np.exp(-a * x)) - 1
+
+
+def batch_scores(
+    matches: np.ndarray,
+    word_counts: np.ndarray,
+    constant_weights: np.ndarray,
+    scaling_weights: np.ndarray,
+    word_count_factor: float,
+    percentile_90: float,
+) -> np.ndarray:
+    """
+    Computes the pscore of every row of a predicate match matrix at once.
+    Matched predicates are compounded in column order, exactly as PageScorer does one page at a time.
+    """
+    values = np.zeros(matches.shape[0], dtype=np.float64)
+    for j in range(matches.shape[1]):
+        values = np.where(
+            matches[:, j], (values + constant_weights[j]) * scaling_weights[j], values
+        )
+
+    values += word_counts * word_count_factor
+    return logistic00_array(values, (percentile_90, 0.9))
+
+
+def rescore(
+    scorer: PageScorer,
+    matches: np.ndarray,
+    word_counts: np.ndarray,
+    constant_weights: np.ndarray | None = None,
+    scaling_weights: np.ndarray | None = None,
+    word_count_factor: float | None = None,
+    percentile_90: float | None = None,
+) -> np.ndarray:
+    """
+    Recomputes pscores from stored predicate matches, overriding any of the scorer's weights.
+    """
+    default_constant_weights, default_scaling_weights = scorer_weights(scorer)
+    return batch_scores(
+        matches,
+        word_counts,
+        default_constant_weights if constant_weights is None else constant_weights,
+        default_scaling_weights if scaling_weights is None else scaling_weights,
+        scorer.word_count_factor if word_count_factor is None else word_count_factor,
+        scorer.percentile_90 if percentile_90 is None else percentile_90,
+    )
@@ -1,6 +1,22 @@
+"""
+Benchmarks the page scorer, link scorer, quick-exit detection and scorer startup from an artifact and from source, e.g.
+
+    python heuristics/benchmark/benchmark.py --output bench.json --baseline baseline.json --threshold 0.15
+
+Runs on resource/benchmark (see download_pages.py) if present, otherwise on a synthetic corpus.
+Each benchmark runs in a fresh process, so its peak RSS is its own.
+Exits with status 1 if any throughput, latency or memory figure regresses past the threshold against the baseline.
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
 import os
-import csv
+import random
+import resource
 import sys
+import tempfile
 import time
 
 THIS_PATH = os.path.dirname(__file__)
@@ -8,66 +24,369 @@ DATA_PATH = os.path.join(THIS_PATH, "..", "..", "resource", "benchmark")
 
 PAGES_PATH = os.path.join(DATA_PATH, "pages")
 URLFILE_PATH = os.path.join(DATA_PATH, "urls.txt")
-OUTFILE_PATH = os.path.join(DATA_PATH, "scores.csv")
 
 sys.path.append(os.path.join(THIS_PATH, "..", ".."))
-from heuristics.dvsvc_scorers import get_link_scorer, get_page_scorer
+from heuristics.artifacts import build_artifact, load_artifact
+from heuristics.documents import HtmlDocument
+from heuristics.dvsvc_scorers import _has_quick_exit, get_link_scorer, get_page_scorer
 
-PAGE_SCORER = get_page_scorer()
-LINK_SCORER = get_link_scorer()
+BENCHMARKS = ["startup", "startup_source", "page", "link", "quick_exit"]
 
+_SYNTHETIC_PAGES = 200
+_SYNTHETIC_URLS = 5000
+_FILLER_WORDS = (
+    "the of and to in is for on that with as by this be are from at or have an news "
+    "about contact us home services more information our team support work community "
+    "council local people help find out read privacy policy cookies accessibility"
+).split()
+_TOPIC_PHRASES = [
+    "domestic abuse",
+    "domestic violence",
+    "coercive control",
+    "women's aid",
+    "refuge",
+    "helpline",
+    "safe space",
+    "survivors",
+    "free and confidential",
+    "open 24 hours",
+    "call us on 0808 2000 247",
+    "abusive relationship",
+    "sexual violence",
+    "stalking",
+    "outreach service",
+]
+_URL_PATHS = [
+    "about-us",
+    "contact",
+    "domestic-abuse",
+    "get-help",
+    "news",
+    "services/refuge",
+    "support",
+    "blog/2023/annual-report",
+    "helpline",
+    "privacy-policy",
+    "events",
+    "donate",
+]
+_URL_HOSTS = [
+    "womensaid.org.uk",
+    "example.co.uk",
+    "council.gov.uk",
+    "refuge.org.uk",
+    "news.example.com",
+    "charity.org",
+]
 
-def run_pages():
-    results = []
 
-    for filename in os.listdir(PAGES_PATH):
-        filepath = os.path.join(PAGES_PATH, filename)
+def synthetic_pages(count: int, seed: int) -> list[tuple[str, str]]:
+    """
+    Generates pages of varying length and topicality, some with quick-exit controls.
+    """
+    rng = random.Random(seed)
+    pages = []
 
-        with open(filepath, "r") as file:
-            page_html = file.read()
+    for i in range(count):
+        topicality = rng.random()
+        paragraphs = []
+        for _ in range(rng.randint(5, 80)):
+            words = [rng.choice(_FILLER_WORDS) for _ in range(rng.randint(10, 60))]
+            if rng.random() < topicality:
+                words.insert(rng.randrange(len(words)), rng.choice(_TOPIC_PHRASES))
+            paragraphs.append("<p>%s.</p>" % " ".join(words))
 
-            t = time.time()
-            score = PAGE_SCORER.score(page_html)
+        links = [
+            '<a href="https://%s/%s">%s</a>'
+            % (
+                rng.choice(_URL_HOSTS),
+                rng.choice(_URL_PATHS),
+                rng.choice(_FILLER_WORDS),
+            )
+            for _ in range(rng.randint(5, 50))
+        ]
+        if rng.random() < topicality / 2:
+            links.append(
+                "<button onclick=\"window.location='https://bbc.co.uk'\">"
+                "Quick exit - leave this site now</button>"
+            )
 
-            print("[%2dms] %s, %s" % (1000 * (time.time() - t), filename, score.value))
+        pages.append(
+            (
+                "synthetic-%04d" % i,
+                "<html><head><title>Page %d</title><script>var x = 1;</script></head>"
+                "<body><nav>%s</nav><main>%s</main></body></html>"
+                % (i, "".join(links), "".join(paragraphs)),
+            )
+        )
 
-            results.append((filename, score.value, score.matched_predicates))
+    return pages
 
-    with open(OUTFILE_PATH, "w", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Filename", "Page score", "Keywords"])
-        writer.writerows(results)
 
-    print("Mean pscore:", sum([score for _, score, _ in results]) / len(results))
-    print("Least pscore:", min([score for _, score, _ in results]))
-    print("Greatest pscore:", max([score for _, score, _ in results]))
-    print("Total pages:", len(results))
-    pscore_under_09 = [
-        (filename, score) for filename, score, _ in results if score < 0.9
+def synthetic_urls(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        "https://%s%s/%s%s"
+        % (
+            rng.choice(["", "www."]),
+            rng.choice(_URL_HOSTS),
+            rng.choice(_URL_PATHS),
+            rng.choice(["", "?page=%d" % rng.randint(1, 20), "#top"]),
+        )
+        for _ in range(count)
     ]
-    print("pscore < 0.9:", len(pscore_under_09), pscore_under_09)
 
 
-def run_links():
-    with open(URLFILE_PATH, "r") as file:
+def load_pages(path: str) -> list[tuple[str, str]]:
+    pages = []
+    for filename in sorted(os.listdir(path)):
+        with open(os.path.join(path, filename), "r") as file:
+            pages.append((filename, file.read()))
+    return pages
+
+
+def load_urls(path: str) -> list[str]:
+    with open(path, "r") as file:
         urls = file.read().splitlines()
-        urls = [url for url in urls if not url.startswith("#")]
+    return [url for url in urls if url and not url.startswith("#")]
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process so far. On Linux it is read from VmHWM, as ru_maxrss carries over the peak
+    of the process this one was forked from. ru_maxrss is in KiB on Linux but bytes on macOS.
+    """
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def measure(function, items: list, repeat: int) -> tuple[dict, list]:
+    """
+    Times function on every item, repeat times over, reporting throughput and latency percentiles.
+    Also returns the outputs of the last repetition.
+    """
+    latencies = []
+    outputs = []
+    for _ in range(repeat):
+        outputs = []
+        for item in items:
+            t = time.perf_counter()
+            outputs.append(function(item))
+            latencies.append(time.perf_counter() - t)
+
+    latencies.sort()
+    total = sum(latencies)
+
+    def percentile(p: float) -> float:
+        return 1000 * latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    return {
+        "items": len(items),
+        "repeat": repeat,
+        "total_s": total,
+        "items_per_s": len(latencies) / total if total else None,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "peak_rss_mb": peak_rss_mb(),
+    }, outputs
+
+
+def run_startup(artifact_path: str, repeat: int) -> dict:
+    result, _ = measure(load_artifact, [artifact_path], repeat)
+    return result
+
+
+def run_startup_source(repeat: int) -> dict:
+    def build(_):
+        return get_page_scorer(), get_link_scorer()
+
+    result, _ = measure(build, [None], repeat)
+    return result
+
+
+def run_pages(pages: list[tuple[str, str]], repeat: int) -> dict:
+    page_scorer = get_page_scorer()
+    result, scores = measure(page_scorer.score, [html for _, html in pages], repeat)
+
+    values = [score.value for score in scores]
+    result["mean_score"] = sum(values) / len(values)
+    result["scores_under_0.9"] = sum(value < 0.9 for value in values)
+    return result
+
+
+def run_links(urls: list[str], repeat: int) -> dict:
+    # Uncached, so repeated URLs measure scanning rather than cache lookups
+    link_scorer = get_link_scorer()
+    link_scorer.url_cache = None
+    result, scores = measure(lambda url: link_scorer.score(url, 0), urls, repeat)
+
+    values = [score.value for score in scores]
+    result["mean_score"] = sum(values) / len(values)
+    result["scores_under_0.9"] = sum(value < 0.9 for value in values)
+    return result
+
+
+def run_quick_exit(pages: list[tuple[str, str]], repeat: int) -> dict:
+    documents = [HtmlDocument.from_html(html) for _, html in pages]
+    result, found = measure(_has_quick_exit, documents, repeat)
+    result["quick_exits"] = sum(found)
+    return result
+
+
+def run_benchmark(
+    name: str,
+    pages: list[tuple[str, str]],
+    urls: list[str],
+    artifact_path: str,
+    repeat: int,
+) -> dict:
+    runners = {
+        "startup": lambda: run_startup(artifact_path, repeat),
+        "startup_source": lambda: run_startup_source(repeat),
+        "page": lambda: run_pages(pages, repeat),
+        "link": lambda: run_links(urls, repeat),
+        "quick_exit": lambda: run_quick_exit(pages, repeat),
+    }
+    # Keep stdout for the JSON results
+    with contextlib.redirect_stdout(sys.stderr):
+        return runners[name]()
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Lists figures worse than the baseline by more than the threshold, as a fraction of the baseline.
+    """
+    failures = []
+    for name, result in results["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if not base:
+            continue
+
+        if base.get("items_per_s") and result["items_per_s"] < base["items_per_s"] * (
+            1 - threshold
+        ):
+            failures.append(
+                "%s: %.1f items/s, baseline %.1f"
+                % (name, result["items_per_s"], base["items_per_s"])
+            )
+        for key in ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"):
+            if base.get(key) and result[key] > base[key] * (1 + threshold):
+                failures.append(
+                    "%s: %s %.2f, baseline %.2f" % (name, key, result[key], base[key])
+                )
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--benchmarks",
+        default=",".join(BENCHMARKS),
+        help="Comma-separated subset of: %s" % ", ".join(BENCHMARKS),
+    )
+    parser.add_argument("--pages", default=PAGES_PATH, help="Directory of pages")
+    parser.add_argument("--urls", default=URLFILE_PATH, help="File of URLs")
+    parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="Use the synthetic corpus even if the pages and URLs exist",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Tolerated regression against the baseline, as a fraction",
+    )
+    args = parser.parse_args()
+
+    benchmarks = args.benchmarks.split(",")
+    for name in benchmarks:
+        if name not in BENCHMARKS:
+            parser.error("Unknown benchmark: %s" % name)
+
+    use_pages = not args.synthetic and os.path.isdir(args.pages)
+    use_urls = not args.synthetic and os.path.isfile(args.urls)
+    pages = (
+        load_pages(args.pages)
+        if use_pages
+        else synthetic_pages(_SYNTHETIC_PAGES, args.seed)
+    )
+    urls = (
+        load_urls(args.urls) if use_urls else synthetic_urls(_SYNTHETIC_URLS, args.seed)
+    )
+
+    results = {
+        "corpus": {
+            "pages": args.pages if use_pages else "synthetic",
+            "page_count": len(pages),
+            "urls": args.urls if use_urls else "synthetic",
+            "url_count": len(urls),
+            "seed": args.seed,
+        },
+        "benchmarks": {},
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Built fresh, as an artifact in resource/ may be out of date with the sources
+        artifact_path = os.path.join(directory, "dvsvc_scorers.artifact")
+        if "startup" in benchmarks:
+            with contextlib.redirect_stdout(sys.stderr):
+                build_artifact(artifact_path)
 
-    scores = {}
+        context = multiprocessing.get_context("spawn")
+        for name in BENCHMARKS:
+            if name not in benchmarks:
+                continue
+            with context.Pool(1) as pool:
+                result = pool.apply(
+                    run_benchmark, (name, pages, urls, artifact_path, args.repeat)
+                )
+            results["benchmarks"][name] = result
+            print(
+                "%-14s %10.1f items/s  p50 %8.2fms  p95 %8.2fms  p99 %8.2fms  peak RSS %7.1fMB"
+                % (
+                    name,
+                    result["items_per_s"],
+                    result["p50_ms"],
+                    result["p95_ms"],
+                    result["p99_ms"],
+                    result["peak_rss_mb"],
+                ),
+                file=sys.stderr,
+            )
 
-    for url in urls:
-        scores[url] = LINK_SCORER.score(url, 0).value
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
 
-    print("Mean lscore:", sum(scores.values()) / len(scores))
-    print("Least lscore:", min(scores.values()))
-    print("Greatest lscore:", max(scores.values()))
-    print("Total links:", len(scores))
-    lscore_under_09 = [(url, score) for url, score in scores.items() if score < 0.9]
-    print("lscore < 0.9:", len(lscore_under_09), lscore_under_09)
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        if baseline.get("corpus") != results["corpus"]:
+            print(
+                "Warning: the baseline was run on a different corpus", file=sys.stderr
+            )
+        failures = regressions(results, baseline, args.threshold)
+        for failure in failures:
+            print("Regression:", failure, file=sys.stderr)
+        if failures:
+            sys.exit(1)
 
 
 if __name__ == "__main__":
-    input("Run lscore? (Enter)")
-    run_links()
-    input("Run pscore? (Enter)")
-    run_pages()
+    main()
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import pickle
+
+from heuristics.helpers import LRUCache
+from heuristics.scorers import Score, predicates_fingerprint
+
+_SCORE_CACHE_VERSION = 4
+
+
+class ScoreCache(LRUCache):
+    """
+    LRU cache of Scores keyed by a hash of the scored content, optionally persisted to disk.
+    Persisted entries are discarded if the registry's predicates, or the cap on the bytes of content scored
+    (0 for none), have changed since.
+    """
+
+    def __init__(
+        self,
+        registry: str,
+        max_size: int,
+        path: str | None = None,
+        max_scored_bytes: int = 0,
+    ):
+        super().__init__(max_size)
+        self.registry = registry
+        self.max_scored_bytes = max_scored_bytes
+        self.path = path
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @staticmethod
+    def content_key(content: bytes) -> bytes:
+        return hashlib.blake2b(content, digest_size=16).digest()
+
+    def fingerprint(self) -> str:
+        return hashlib.sha1(
+            repr(
+                (predicates_fingerprint([self.registry]), self.max_scored_bytes)
+            ).encode()
+        ).hexdigest()
+
+    def save(self, path: str | None = None) -> None:
+        path = path or self.path
+        if not path:
+            return
+        entries = [
+            (key, score.value, score.mask, score.truncated)
+            for key, score in self.entries.items()
+        ]
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump(
+                {
+                    "version": _SCORE_CACHE_VERSION,
+                    "fingerprint": self.fingerprint(),
+                    "entries": entries,
+                },
+                file,
+            )
+        os.replace(temp_path, path)
+
+    def load(self, path: str) -> None:
+        with open(path, "rb") as file:
+            data = pickle.load(file)
+        if (
+            data.get("version") != _SCORE_CACHE_VERSION
+            or data.get("fingerprint") != self.fingerprint()
+        ):
+            return
+        for key, value, mask, truncated in data["entries"][-self.max_size :]:
+            self.entries[key] = Score(value, mask, self.registry, truncated)
@@ -0,0 +1,68 @@
+import codecs
+from lxml import etree, html
+
+# Text nodes as BeautifulSoup's get_text() sees them: no script, style or template contents, and no comments
+_TEXT_NODES = etree.XPath(
+    ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]",
+    smart_strings=False,
+)
+
+_PARSER = html.HTMLParser(recover=True, encoding="utf8")
+
+# Bytes decoded at a time when finding where to truncate a body
+_DECODE_CHUNK_SIZE = 1 << 16
+
+
+def truncate_body(body: bytes, encoding: str, max_bytes: int) -> tuple[bytes, bool]:
+    """
+    Cuts a body down to at most max_bytes at a character boundary, returning it and whether it was cut.
+    """
+    if len(body) <= max_bytes:
+        return body, False
+
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    except LookupError:
+        return body[:max_bytes], True
+
+    # Decode a chunk at a time, discarding the text, until only an incomplete character may be left pending
+    view = memoryview(body)
+    for start in range(0, max_bytes, _DECODE_CHUNK_SIZE):
+        decoder.decode(view[start : min(start + _DECODE_CHUNK_SIZE, max_bytes)])
+    pending, _ = decoder.getstate()
+    return body[: max_bytes - len(pending)], True
+
+
+class HtmlDocument:
+    """
+    A page parsed once with lxml, shared by the page scorer and by link extraction.
+    A truncated document was parsed from only the start of its page.
+    """
+
+    def __init__(self, root: etree._Element, truncated: bool = False):
+        self.root = root
+        self.truncated = truncated
+        self._text: str | None = None
+
+    @classmethod
+    def from_html(cls, page_html: str, max_bytes: int | None = None) -> "HtmlDocument":
+        # Parse as bytes, like Scrapy's selectors, so encoding declarations in the markup are tolerated
+        body = page_html.strip().replace("\x00", "").encode("utf8") or b"<html/>"
+        truncated = False
+        if max_bytes is not None:
+            body, truncated = truncate_body(body, "utf8", max_bytes)
+        root = etree.fromstring(body, parser=_PARSER)
+        if root is None:
+            # Only comments, a doctype or processing instructions, which parsel also treats as an empty page
+            root = etree.fromstring(b"<html/>", parser=_PARSER)
+        return cls(root, truncated)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(_TEXT_NODES(self.root))
+        return self._text
+
+    @staticmethod
+    def element_text(element: etree._Element) -> str:
+        return "".join(_TEXT_NODES(element))
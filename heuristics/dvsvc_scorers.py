@@ -1,12 +1,14 @@
 from math import inf
 import os
-from bs4 import BeautifulSoup
+from lxml import etree
 
-from heuristics.helpers import read_csv_as_dict
+from heuristics.documents import HtmlDocument
+from heuristics.helpers import read_csv_column
 from heuristics.scorers import (
     HtmlPredicate,
     RegexPredicate,
     KeywordPredicate,
+    PhrasePredicate,
     LinkScorer,
     PageScorer,
 )
@@ -22,39 +24,57 @@ if not os.path.exists(__SCOT_CHARITIES_PATH):
     )
 
 
-def _has_quick_exit(soup: BeautifulSoup) -> bool:
-    anchors = soup.find_all("a")
-    buttons = soup.find_all("button")
-    clickables = soup.find_all(attrs={"onclick": True})
+# Anchors, buttons and onclick elements, each returned once in document order
+_CLICKABLES = etree.XPath("//a | //button | //*[@onclick]")
 
-    matches = 0
-    NECESSARY_MATCHES = 2
+_QUICK_EXIT_ACTIONS = {"close", "exit", "leave", "hide"}
+_QUICK_EXIT_URGENCY = {
+    "now",
+    "quick",
+    "quickly",
+    "emergency",
+    "instant",
+    "instantly",
+    "fast",
+}
+_QUICK_EXIT_TARGETS = {"site", "website", "page", "webpage", "history", "visit"}
+_QUICK_EXIT_NECESSARY_MATCHES = 2
 
-    for element in anchors + buttons + clickables:
-        words = element.get_text().lower().split(" ")
 
-        if any(w in words for w in ["close", "exit", "leave", "hide"]):
-            matches += 1
-            if any(
-                w in words
-                for w in [
-                    "now",
-                    "quick",
-                    "quickly",
-                    "emergency",
-                    "instant",
-                    "instantly",
-                    "fast",
-                ]
-            ):
-                matches += 1
-            if any(
-                w in words
-                for w in ["site", "website", "page", "webpage", "history", "visit"]
-            ):
-                matches += 1
+def quick_exit_matches(
+    document: HtmlDocument, stop_at: int | None = None
+) -> dict[str, int]:
+    """
+    Counts quick-exit wording on clickable elements, visiting each element once.
+    An anchor or button that also has an onclick handler counts twice, as it is both a link and a clickable.
+    """
+    counts = {"clickables": 0, "actions": 0, "urgency": 0, "targets": 0, "total": 0}
 
-    return matches >= NECESSARY_MATCHES
+    for element in _CLICKABLES(document.root):
+        counts["clickables"] += 1
+        words = set(HtmlDocument.element_text(element).lower().split(" "))
+        if words.isdisjoint(_QUICK_EXIT_ACTIONS):
+            continue
+
+        multiplicity = (element.tag in ("a", "button")) + ("onclick" in element.attrib)
+        counts["actions"] += multiplicity
+        if not words.isdisjoint(_QUICK_EXIT_URGENCY):
+            counts["urgency"] += multiplicity
+        if not words.isdisjoint(_QUICK_EXIT_TARGETS):
+            counts["targets"] += multiplicity
+
+        counts["total"] = counts["actions"] + counts["urgency"] + counts["targets"]
+        if stop_at is not None and counts["total"] >= stop_at:
+            break
+
+    return counts
+
+
+def _has_quick_exit(document: HtmlDocument) -> bool:
+    return (
+        quick_exit_matches(document, stop_at=_QUICK_EXIT_NECESSARY_MATCHES)["total"]
+        >= _QUICK_EXIT_NECESSARY_MATCHES
+    )
 
 
 def get_link_scorer() -> LinkScorer:
@@ -125,19 +145,22 @@ def get_link_scorer() -> LinkScorer:
         RegexPredicate({r"\.gy($|/)"}, constant_weight=-inf),
         RegexPredicate({r"\.bz($|/)"}, constant_weight=-inf),
     ]
-    return LinkScorer(25, 0.2, LINK_PREDICATES)
+    return LinkScorer(25, 0.2, LINK_PREDICATES, cache_size=100_000)
 
 
 def get_page_scorer() -> PageScorer:
-    SCOT_CHARITIES = read_csv_as_dict(__SCOT_CHARITIES_PATH)
+    SCOT_CHARITIES = read_csv_column(__SCOT_CHARITIES_PATH, "Charity Name")
 
     print("Loaded charities:", len(SCOT_CHARITIES))
 
     PAGE_PREDICATES = [
-        KeywordPredicate(
-            set(SCOT_CHARITIES.keys()),
+        # Match multi-word names as phrases; very short names are too ambiguous to count
+        PhrasePredicate(
+            SCOT_CHARITIES,
             constant_weight=3,
             scaling_weight=1.2,
+            whole_word=True,
+            min_length=8,
             alias="SCOT-CHARITY",
         ),
         KeywordPredicate(
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+from heuristics.scorers import PageScorer, predicate_names
+
+_HEADER = "header.json"
+_VERSION = 3
+_FLUSH_EVERY = 1000
+
+
+def hash64(text: str | bytes) -> int:
+    if isinstance(text, str):
+        text = text.encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(text, digest_size=8).digest(), "little")
+
+
+def column_dtypes(predicate_count: int) -> dict[str, np.dtype]:
+    """
+    The dtype of one page's value in each column, each column being stored in a file of its own.
+    """
+    return {
+        "url": np.dtype("<u8"),
+        "content": np.dtype("<u8"),
+        "fld": np.dtype("<u8"),
+        "word_count": np.dtype("<u4"),
+        # Pages whose content was already scored under another URL only reference it
+        "has_features": np.dtype("u1"),
+        "matches": np.dtype(("u1", ((predicate_count + 7) // 8,))),
+    }
+
+
+def scorer_header(scorer: PageScorer) -> dict:
+    return {
+        "version": _VERSION,
+        "percentile_90": scorer.percentile_90,
+        "word_count_factor": scorer.word_count_factor,
+        "predicates": [
+            {
+                "name": name,
+                "type": type(p).__name__,
+                "constant_weight": p.constant_weight,
+                "scaling_weight": p.scaling_weight,
+            }
+            for name, p in zip(predicate_names(scorer.predicates), scorer.predicates)
+        ],
+    }
+
+
+def _read_header(path: str) -> dict:
+    try:
+        with open(os.path.join(path, _HEADER), "rb") as file:
+            header = json.load(file)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Not a feature store: {path}") from e
+    if header.get("version") != _VERSION:
+        raise ValueError(f"Unsupported feature store version: {header.get('version')}")
+    return header
+
+
+def _column_path(path: str, column: str) -> str:
+    return os.path.join(path, f"{column}.bin")
+
+
+class FeatureStoreWriter:
+    """
+    Appends one entry per scored page to each column: URL, content and FLD hashes, word count and a bitset of matches.
+    """
+
+    def __init__(self, path: str, scorer: PageScorer):
+        self.path = path
+        self.header = scorer_header(scorer)
+        self.dtypes = column_dtypes(len(scorer.predicates))
+        self.buffer = []
+
+        if os.path.exists(os.path.join(path, _HEADER)):
+            if _read_header(path)["predicates"] != self.header["predicates"]:
+                raise ValueError(
+                    f"Feature store {path} was written with different predicates"
+                )
+        else:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, _HEADER), "w") as file:
+                json.dump(self.header, file)
+
+    def append(
+        self,
+        url: str,
+        content: bytes,
+        fld: str,
+        features: tuple[list[bool], int] | None,
+    ) -> None:
+        matches, word_count = features if features else ([], 0)
+        bits = (
+            np.packbits(np.array(matches, dtype=bool), bitorder="little")
+            if matches
+            else np.zeros(self.dtypes["matches"].shape, dtype="u1")
+        )
+        self.buffer.append(
+            (
+                hash64(url),
+                hash64(content),
+                hash64(fld),
+                word_count,
+                features is not None,
+                bits,
+            )
+        )
+        if len(self.buffer) >= _FLUSH_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        for column, (name, dtype) in enumerate(self.dtypes.items()):
+            values = np.array([row[column] for row in self.buffer], dtype=dtype)
+            with open(_column_path(self.path, name), "ab") as file:
+                values.tofile(file)
+        self.buffer = []
+
+    def close(self) -> None:
+        self.flush()
+
+
+def load_feature_store(
+    path: str, columns: list[str] | None = None
+) -> tuple[dict, dict[str, np.ndarray]]:
+    """
+    Memory-maps the given columns of a feature store, all of them by default, returning its header and the columns.
+    Only the files of the given columns are opened.
+    """
+    header = _read_header(path)
+    dtypes = column_dtypes(len(header["predicates"]))
+    names = list(dtypes) if columns is None else columns
+    for name in names:
+        if name not in dtypes:
+            raise ValueError(f"No feature store column named {name!r}")
+
+    # A crawl stopped mid-flush may leave some columns longer than others
+    count = min(
+        (
+            os.path.getsize(_column_path(path, name)) // dtypes[name].itemsize
+            if os.path.exists(_column_path(path, name))
+            else 0
+        )
+        for name in dtypes
+    )
+    return header, {
+        name: (
+            np.memmap(
+                _column_path(path, name),
+                dtype=dtypes[name],
+                mode="r",
+                shape=count,
+            )
+            if count
+            else np.zeros(0, dtype=dtypes[name])
+        )
+        for name in names
+    }
+
+
+def resolve_features(
+    columns: dict[str, np.ndarray], predicate_count: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Unpacks every page's matches into an N x P boolean matrix, copying features into pages that only reference
+    content scored elsewhere. Returns the matrix, the word counts and a mask of pages whose features were found.
+    """
+    has_features = columns["has_features"].astype(bool)
+    content, first_index = np.unique(
+        columns["content"][has_features], return_index=True
+    )
+    source_rows = np.flatnonzero(has_features)[first_index]
+
+    position = np.searchsorted(content, columns["content"])
+    position = np.minimum(position, max(len(content) - 1, 0))
+    found = (
+        content[position] == columns["content"]
+        if len(content)
+        else np.zeros(len(has_features), dtype=bool)
+    )
+    rows = np.where(has_features, np.arange(len(has_features)), -1)
+    rows[~has_features & found] = source_rows[position[~has_features & found]]
+
+    resolved = rows >= 0
+    matches = np.unpackbits(
+        columns["matches"][rows[resolved]], axis=1, bitorder="little"
+    )[:, :predicate_count].astype(bool)
+    word_counts = columns["word_count"][rows[resolved]].astype(np.int64)
+    return matches, word_counts, resolved
@@ -1,5 +1,14 @@
 import csv
+import re
+from collections import OrderedDict
 from math import exp, log, e as EULER
+from typing import Any, Hashable, Iterator
+
+_PUNCTUATION = "`!@#$%^&*()_+-=[]{};':\"\\|,.<>/?~"
+_PUNCTUATION_TO_SPACE = str.maketrans(_PUNCTUATION, " " * len(_PUNCTUATION))
+_WHITESPACE = re.compile(r"\s")
+# Characters tokenized at a time, bounding the copies and lists of words held at once
+_WORD_CHUNK_SIZE = 1 << 16
 
 
 def read_csv_as_dict(csv_file) -> dict[str, list[str]]:
@@ -18,6 +27,83 @@ def read_csv_as_dict(csv_file) -> dict[str, list[str]]:
     return data
 
 
+def read_csv_column(csv_file, column: str) -> list[str]:
+    """
+    Reads the values of a single named column from a CSV file with a header row.
+    """
+    with open(csv_file, "r") as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        if column not in header:
+            raise ValueError(f"Column {column} not found in {csv_file}")
+        index = header.index(column)
+        return [row[index] for row in reader if len(row) > index]
+
+
+def clean_text(text: str) -> str:
+    """
+    Replaces punctuation with spaces and collapses whitespace.
+    """
+    ends = _end_characters(text)
+    if ends is None:
+        return ""
+    cleaned = " ".join(" ".join(words) for words in _word_chunks(text) if words)
+    if not cleaned:
+        return " "
+    # Punctuation at either end leaves a space there
+    return (
+        (" " if ends[0] in _PUNCTUATION else "")
+        + cleaned
+        + (" " if ends[1] in _PUNCTUATION else "")
+    )
+
+
+def _end_characters(text: str) -> tuple[str, str] | None:
+    # The first and last characters that aren't whitespace, found without stripping (copying) the text
+    first, last = 0, len(text) - 1
+    while first <= last and text[first].isspace():
+        first += 1
+    while last >= first and text[last].isspace():
+        last -= 1
+    return (text[first], text[last]) if first <= last else None
+
+
+def _word_chunks(text: str) -> Iterator[list[str]]:
+    # Words never span whitespace, so chunks end at whitespace
+    start = 0
+    while start < len(text):
+        end = start + _WORD_CHUNK_SIZE
+        if end < len(text):
+            whitespace = _WHITESPACE.search(text, end)
+            end = whitespace.start() if whitespace else len(text)
+        yield text[start:end].translate(_PUNCTUATION_TO_SPACE).split()
+        start = end
+
+
+def iter_words(text: str) -> Iterator[str]:
+    """
+    Yields the non-empty words of clean_text(text).split(" ") without building the cleaned text.
+    """
+    for chunk in _word_chunks(text):
+        yield from chunk
+
+
+def word_set(text: str) -> set[str]:
+    """
+    Equals set(clean_text(text).split(" ")), tokenizing the text a chunk at a time without building the cleaned text.
+    """
+    words = set()
+    for chunk in _word_chunks(text):
+        words.update(chunk)
+
+    # The cleaned text has an empty word at an end when the text is blank or starts or ends with punctuation
+    ends = _end_characters(text)
+    if ends is None or ends[0] in _PUNCTUATION or ends[1] in _PUNCTUATION:
+        words.add("")
+
+    return words
+
+
 def logistic00(
     x: float, fit_to_point: tuple[float, float] = (1.0, EULER / (EULER + 1.0))
 ) -> float:
@@ -31,3 +117,37 @@ def logistic00(
     # Determine the constant `a` to fit logistic curve through the given point
     a = -log((1 - fit_to_point[1]) / (1 + fit_to_point[1])) / fit_to_point[0]
     return 2 / (1 + exp(-a * x)) - 1
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry, counting hits and misses.
+    """
+
+    def __init__(self, max_size: int):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
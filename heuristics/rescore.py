@@ -0,0 +1,145 @@
+"""
+Recomputes pscores and itemisation decisions from a feature store for new weights or thresholds, e.g.
+
+    python -m heuristics.rescore features --weight KW-HELPLINE=6,1 --good 0.75
+"""
+
+import argparse
+import json
+import numpy as np
+
+from heuristics.batch import batch_scores
+from heuristics.features import load_feature_store, resolve_features
+
+# Defaults as in dvsvc_crawl.spiders.dvsvc_spider
+_EXCEPTIONAL_PSCORE = 0.95
+_GOOD_PSCORE = 0.80
+_FLD_GOOD_PSCORE_RATIO = 0.6
+_FLD_PSCORE_SAMPLES = 5
+_FLD_MAX_CANDIDATES = 16
+
+
+def itemisation_decisions(
+    pscores: np.ndarray,
+    flds: np.ndarray,
+    exceptional_pscore: float,
+    good_pscore: float,
+    fld_good_pscore_ratio: float,
+    fld_pscore_samples: int,
+    fld_max_candidates: int = _FLD_MAX_CANDIDATES,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Replays the spider's itemisation in crawl order, returning masks of pages itemised alone and as part of a batch.
+    Like the spider, only the fld_max_candidates best good pages of an FLD are kept for its batch.
+    """
+    exceptional = pscores >= exceptional_pscore
+    good = pscores >= good_pscore
+    batched = np.zeros(len(pscores), dtype=bool)
+
+    # FLD -> (total pages, good pages, indices of the best good pages) since the FLD's last batch
+    histories: dict[int, tuple[int, int, list[int]]] = {}
+    for i, (fld, is_good) in enumerate(zip(flds.tolist(), good.tolist())):
+        total, good_count, good_pages = histories.get(fld, (0, 0, []))
+        total += 1
+        if is_good:
+            good_count += 1
+            if len(good_pages) < fld_max_candidates:
+                good_pages.append(i)
+            else:
+                worst = min(
+                    range(len(good_pages)), key=lambda j: pscores[good_pages[j]]
+                )
+                if pscores[i] > pscores[good_pages[worst]]:
+                    good_pages[worst] = i
+
+        if total >= fld_pscore_samples and good_count / total >= fld_good_pscore_ratio:
+            batched[good_pages] = True
+            histories.pop(fld, None)
+        else:
+            histories[fld] = (total, good_count, good_pages)
+
+    return exceptional, batched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("store", help="Feature store directory written by the crawler")
+    parser.add_argument(
+        "--weight",
+        action="append",
+        default=[],
+        metavar="NAME=CONSTANT,SCALING",
+        help="Override a predicate's weights by name, as stored in the feature store",
+    )
+    parser.add_argument("--word-count-factor", type=float)
+    parser.add_argument("--percentile-90", type=float)
+    parser.add_argument("--exceptional", type=float, default=_EXCEPTIONAL_PSCORE)
+    parser.add_argument("--good", type=float, default=_GOOD_PSCORE)
+    parser.add_argument("--fld-ratio", type=float, default=_FLD_GOOD_PSCORE_RATIO)
+    parser.add_argument("--fld-samples", type=int, default=_FLD_PSCORE_SAMPLES)
+    parser.add_argument("--fld-candidates", type=int, default=_FLD_MAX_CANDIDATES)
+    args = parser.parse_args()
+
+    header, columns = load_feature_store(args.store)
+    predicates = header["predicates"]
+    matches, word_counts, resolved = resolve_features(columns, len(predicates))
+
+    constant_weights = np.array([p["constant_weight"] for p in predicates])
+    scaling_weights = np.array([p["scaling_weight"] for p in predicates])
+    names = [p["name"] for p in predicates]
+    for override in args.weight:
+        name, _, weights = override.partition("=")
+        constant, _, scaling = weights.partition(",")
+        if not constant or not scaling:
+            parser.error(f"--weight {override}: expected NAME=CONSTANT,SCALING")
+        if name not in names:
+            parser.error(f"--weight {override}: no predicate named {name!r}")
+        try:
+            constant_weights[names.index(name)] = float(constant)
+            scaling_weights[names.index(name)] = float(scaling)
+        except ValueError:
+            parser.error(f"--weight {override}: weights must be numbers")
+
+    pscores = batch_scores(
+        matches,
+        word_counts,
+        constant_weights,
+        scaling_weights,
+        (
+            header["word_count_factor"]
+            if args.word_count_factor is None
+            else args.word_count_factor
+        ),
+        header["percentile_90"] if args.percentile_90 is None else args.percentile_90,
+    )
+    exceptional, batched = itemisation_decisions(
+        pscores,
+        columns["fld"][resolved],
+        args.exceptional,
+        args.good,
+        args.fld_ratio,
+        args.fld_samples,
+        args.fld_candidates,
+    )
+
+    print(
+        json.dumps(
+            {
+                "pages": int(len(resolved)),
+                "unresolved_pages": int((~resolved).sum()),
+                "mean_pscore": float(pscores.mean()) if len(pscores) else None,
+                "good_pages": int((pscores >= args.good).sum()),
+                "exceptional_pages": int(exceptional.sum()),
+                "batched_pages": int(batched.sum()),
+                "itemised_pages": int((exceptional | batched).sum()),
+                "itemised_flds": int(
+                    len(np.unique(columns["fld"][resolved][exceptional | batched]))
+                ),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
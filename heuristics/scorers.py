@@ -1,10 +1,13 @@
-from typing import Callable, Collection
-from bs4 import BeautifulSoup
+from typing import Callable, Collection, Iterable
 from tld import get_tld
 from typing import Any
+from time import perf_counter
+import hashlib
 import re
 
-from heuristics.helpers import logistic00
+from heuristics.automata import PhraseAutomaton
+from heuristics.documents import HtmlDocument
+from heuristics.helpers import LRUCache, clean_text, iter_words, logistic00, word_set
 
 
 class Predicate:
@@ -17,7 +20,7 @@ class Predicate:
 class HtmlPredicate(Predicate):
     def __init__(
         self,
-        apply: Callable[[BeautifulSoup], bool],
+        apply: Callable[[HtmlDocument], bool],
         constant_weight: float = 0.0,
         scaling_weight: float = 1.0,
         topic: int = 0,
@@ -78,7 +81,7 @@ class KeywordPredicate(Predicate):
             + " ".join(
                 [
                     f"{{{next(iter(keyword_set))} ... }}"
-                    for keyword_set in self.keyword_set
+                    for keyword_set in self.keyword_sets
                 ]
             )
             + ")"
@@ -93,6 +96,7 @@ class RegexPredicate(Predicate):
         scaling_weight: float = 1.0,
         alias: str | None = None,
     ):
+        self.pattern_sets = [set(p) for p in patterns]
         self.patterns = [re.compile("|".join(p)) for p in patterns]
         self.constant_weight = constant_weight
         self.scaling_weight = scaling_weight
@@ -110,77 +114,479 @@ class RegexPredicate(Predicate):
         return (
             self.__class__.__name__
             + "("
-            + " ".join([f"{{{next(iter(p))} ... }}" for p in self.patterns])
+            + " ".join([f"{{{next(iter(p))} ... }}" for p in self.pattern_sets])
             + ")"
         )
 
 
+class PhrasePredicate(Predicate):
+    def __init__(
+        self,
+        phrases: Iterable[str],
+        constant_weight: float = 0.0,
+        scaling_weight: float = 1.0,
+        whole_word: bool = True,
+        min_length: int = 1,
+        topic: int = 0,
+        alias: str | None = None,
+    ):
+        normalised = {clean_text(phrase).strip().lower() for phrase in phrases}
+        # Sort for a deterministic automaton layout
+        self.phrases = sorted(p for p in normalised if len(p) >= min_length)
+        self.whole_word = whole_word
+        self.min_length = min_length
+        # Whole-word phrases are matched word by word, others character by character
+        self.automaton = PhraseAutomaton(
+            [p.split(" ") for p in self.phrases] if whole_word else self.phrases
+        )
+        self.constant_weight = constant_weight
+        self.scaling_weight = scaling_weight
+        self.topic = topic
+        self.alias = alias
+
+    def apply(self, page_text: str) -> bool:
+        # Expects cleaned, lower-case text
+        return self.automaton.search(
+            page_text.split(" ") if self.whole_word else page_text
+        )
+
+    def apply_words(self, page_words: Iterable[str]) -> bool:
+        # Expects the lower-case words of a page in order, for whole-word phrases
+        return self.automaton.search(page_words)
+
+    def __str__(self):
+        if self.alias:
+            return "PH-" + self.alias
+        return f"{self.__class__.__name__}({len(self.phrases)} phrases)"
+
+
+class KeywordIndex:
+    """
+    Inverted index mapping each keyword to the (predicate, keyword set) pairs containing it.
+    """
+
+    def __init__(self, predicates: list[KeywordPredicate]):
+        self.predicates = predicates
+        self.index: dict[str, list[tuple[int, int]]] = {}
+
+        for i, predicate in enumerate(predicates):
+            for j, keyword_set in enumerate(predicate.keyword_sets):
+                for keyword in keyword_set:
+                    self.index.setdefault(keyword, []).append((i, j))
+
+    def match(self, page_words: set[str]) -> set[KeywordPredicate]:
+        """
+        Finds all satisfied predicates in a single pass over the smaller of the page's words and the index.
+        """
+        occurrences = [[0] * len(p.keyword_sets) for p in self.predicates]
+
+        if len(page_words) <= len(self.index):
+            for word in page_words:
+                postings = self.index.get(word)
+                if postings:
+                    for i, j in postings:
+                        occurrences[i][j] += 1
+        else:
+            for keyword, postings in self.index.items():
+                if keyword in page_words:
+                    for i, j in postings:
+                        occurrences[i][j] += 1
+
+        return {
+            predicate
+            for predicate, counts in zip(self.predicates, occurrences)
+            if all(count >= predicate.required_occurrences for count in counts)
+        }
+
+
+class RegexScanner:
+    """
+    Finds every satisfied RegexPredicate in a single scan of a text.
+    Literal patterns are matched together by a character-level automaton. The others are combined into one lookahead
+    regex, and only the positions where it hits are checked against each pattern.
+    """
+
+    def __init__(self, predicates: list[RegexPredicate]):
+        self.predicates = predicates
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+
+        for i, predicate in enumerate(predicates):
+            for j, pattern_set in enumerate(predicate.pattern_sets):
+                for pattern in pattern_set:
+                    self.postings.setdefault(pattern, []).append((i, j))
+
+        self.literals = [p for p in self.postings if re.escape(p) == p]
+        self.literal_automaton = PhraseAutomaton(self.literals)
+
+        self.expressions = [p for p in self.postings if re.escape(p) != p]
+        self.compiled_expressions = [re.compile(p) for p in self.expressions]
+        self.combined_expression = (
+            re.compile("(?=" + "|".join(f"(?:{p})" for p in self.expressions) + ")")
+            if self.expressions
+            else None
+        )
+
+    def scan(self, text: str) -> set[RegexPredicate]:
+        found = {self.literals[k] for k in self.literal_automaton.iter_matches(text)}
+
+        if self.combined_expression:
+            for hit in self.combined_expression.finditer(text):
+                for pattern, compiled in zip(
+                    self.expressions, self.compiled_expressions
+                ):
+                    if pattern not in found and compiled.match(text, hit.start()):
+                        found.add(pattern)
+
+        hits = [[False] * len(p.pattern_sets) for p in self.predicates]
+        for pattern in found:
+            for i, j in self.postings[pattern]:
+                hits[i][j] = True
+
+        return {
+            predicate
+            for predicate, pattern_hits in zip(self.predicates, hits)
+            if all(pattern_hits)
+        }
+
+
+def predicate_names(predicates: list[Predicate]) -> list[str]:
+    return [
+        str(p) if getattr(p, "alias", None) else f"{p.__class__.__name__}#{i}"
+        for i, p in enumerate(predicates)
+    ]
+
+
+class PredicateStats:
+    """
+    Cumulative calls, matches and evaluation time per predicate name.
+    """
+
+    def __init__(self):
+        self.counters: dict[str, list[float]] = {}
+
+    def record(self, name: str, is_match: bool, seconds: float) -> None:
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = [0, 0, 0.0]
+        counter[0] += 1
+        counter[1] += is_match
+        counter[2] += seconds
+
+    def merge(self, counters: dict[str, list[float]]) -> None:
+        for name, (calls, matches, seconds) in counters.items():
+            counter = self.counters.setdefault(name, [0, 0, 0.0])
+            counter[0] += calls
+            counter[1] += matches
+            counter[2] += seconds
+
+    def drain(self) -> dict[str, list[float]]:
+        """
+        Returns the counters recorded so far and starts afresh, e.g. to send them to another process.
+        """
+        counters, self.counters = self.counters, {}
+        return counters
+
+
+# Predicate lists by registry name, each owned by a scorer, through which Scores resolve their masks
+_PREDICATE_REGISTRIES: dict[str, list[Predicate]] = {}
+
+
+def register_predicates(registry: str, predicates: list[Predicate]) -> None:
+    _PREDICATE_REGISTRIES[registry] = predicates
+
+
+def registered_predicates(registry: str) -> list[Predicate]:
+    return _PREDICATE_REGISTRIES[registry]
+
+
+def predicates_fingerprint(registries: Iterable[str] | None = None) -> str:
+    """
+    Digest of the predicates of the given registries (by default all of them), which Score masks index into.
+    """
+    # Not str(predicate), as unaliased predicates describe themselves by their first keywords only
+    return hashlib.sha1(
+        repr(
+            [
+                (
+                    registry,
+                    [
+                        (
+                            type(p).__name__,
+                            getattr(p, "alias", None),
+                            p.constant_weight,
+                            p.scaling_weight,
+                        )
+                        for p in _PREDICATE_REGISTRIES[registry]
+                    ],
+                )
+                for registry in sorted(
+                    _PREDICATE_REGISTRIES if registries is None else registries
+                )
+            ]
+        ).encode()
+    ).hexdigest()
+
+
 class Score:
-    def __init__(self, value: float, matched_predicates: list[Predicate]):
+    """
+    A score's value and its matched predicates, as a bitmask of indices into a registered predicate list.
+    Only the registry's name is pickled, so the receiving process must have registered the same predicates.
+    A truncated score was computed from only the start of its page.
+    """
+
+    __slots__ = ("value", "mask", "registry", "truncated")
+
+    def __init__(
+        self,
+        value: float,
+        mask: int = 0,
+        registry: str | None = None,
+        truncated: bool = False,
+    ):
         self.value = value
-        self.matched_predicates = matched_predicates
+        self.mask = mask
+        self.registry = registry
+        self.truncated = truncated
+
+    @property
+    def matched_predicates(self) -> list[Predicate]:
+        if not self.mask:
+            return []
+        predicates = _PREDICATE_REGISTRIES[self.registry]
+        return [
+            predicates[i] for i in range(self.mask.bit_length()) if self.mask >> i & 1
+        ]
 
     def __str__(self):
         return f"{self.__class__.__name__}({self.value:.3f}, {[str(p) for p in self.matched_predicates]})"
 
 
 class _ScoreBuilder:
-    def __init__(self):
-        self.value = 0
-        self.matched_predicates = []
+    def __init__(self, value: float = 0, mask: int = 0):
+        self.value = value
+        self.mask = mask
 
-    def compound(self, predicate: Predicate) -> None:
+    def compound(self, index: int, predicate: Predicate) -> None:
         self.apply_weights(predicate.constant_weight, predicate.scaling_weight)
-        self.matched_predicates.append(predicate)
+        self.mask |= 1 << index
 
     def apply_weights(self, constant_weight: float, scaling_weight: float) -> None:
         self.value += constant_weight
         self.value *= scaling_weight
 
-    def get_score(self, percentile_90: float) -> Score:
+    def get_score(
+        self, percentile_90: float, registry: str, truncated: bool = False
+    ) -> Score:
         return Score(
-            logistic00(self.value, (percentile_90, 0.9)), self.matched_predicates
+            logistic00(self.value, (percentile_90, 0.9)), self.mask, registry, truncated
+        )
+
+
+class _PageFeatures:
+    """
+    A page's set of words, tokenized in a single pass over its lower-case text.
+    The cleaned texts are only built if a predicate needs them.
+    """
+
+    def __init__(self, page: str | HtmlDocument):
+        self.document = (
+            page if isinstance(page, HtmlDocument) else HtmlDocument.from_html(page)
         )
+        self.lower_text = self.document.text.lower()
+        self.words = word_set(self.lower_text)
+        self._text: str | None = None
+        self._text_lower: str | None = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = clean_text(self.document.text)
+        return self._text
+
+    @property
+    def text_lower(self) -> str:
+        if self._text_lower is None:
+            self._text_lower = clean_text(self.lower_text)
+        return self._text_lower
 
 
 class PageScorer:
+    # Relative evaluation cost of each predicate type, used to order predicates in decide()
+    _PREDICATE_COSTS = {
+        KeywordPredicate: 0,
+        RegexPredicate: 1,
+        PhrasePredicate: 2,
+        HtmlPredicate: 3,
+    }
+
     def __init__(
         self,
         percentile_90: float,
         word_count_factor: float,
         predicates: list[Predicate],
+        registry: str = "page",
     ):
         self.percentile_90 = percentile_90
         self.word_count_factor = word_count_factor
         self.predicates = predicates
+        self.registry = registry
+        register_predicates(registry, predicates)
+        self.predicate_names = predicate_names(predicates)
+        # Set to a PredicateStats to time each predicate, at the cost of a clock read per evaluation
+        self.stats: PredicateStats | None = None
+        self.keyword_index = KeywordIndex(
+            [p for p in predicates if type(p) is KeywordPredicate]
+        )
+        # Keyword predicates are evaluated together through the index, the rest one by one, cheapest first
+        self.evaluation_tiers = [
+            [i for i, p in enumerate(predicates) if type(p) is KeywordPredicate]
+        ] + [
+            [i]
+            for i in sorted(
+                (
+                    i
+                    for i, p in enumerate(predicates)
+                    if type(p) is not KeywordPredicate
+                ),
+                key=lambda i: self._PREDICATE_COSTS[type(predicates[i])],
+            )
+        ]
 
-    def score(self, page_html: str) -> Score:
-        soup = BeautifulSoup(page_html, "html.parser")
-
-        page_text = self._cleaned_text(soup.get_text())
-        page_words = set(page_text.lower().split(" "))
+    def __setstate__(self, state: dict) -> None:
+        # Unpickled scorers, e.g. from an artifact, register their predicates like new ones
+        self.__dict__.update(state)
+        register_predicates(self.registry, self.predicates)
 
+    def score(self, page: str | HtmlDocument) -> Score:
+        document = (
+            page if isinstance(page, HtmlDocument) else HtmlDocument.from_html(page)
+        )
+        matches, word_count = self.evaluate(document)
+        return self.score_matches(matches, word_count, document.truncated)
+
+    def evaluate(self, page: str | HtmlDocument) -> tuple[list[bool], int]:
+        """
+        Evaluates every predicate on a page, returning which ones matched and the page's word count.
+        """
+        features, keyword_matches = self._prepare(page)
+
+        matches = [
+            self._apply(i, features, keyword_matches)
+            for i in range(len(self.predicates))
+        ]
+        return matches, len(features.words)
+
+    def score_matches(
+        self, matches: list[bool | None], word_count: int, truncated: bool = False
+    ) -> Score:
+        """
+        Builds a Score from predicate matches, e.g. as returned by evaluate().
+        """
         sb = _ScoreBuilder()
 
-        for predicate in self.predicates:
-            if type(predicate) is HtmlPredicate:
-                is_match = predicate.apply(soup)
-            elif type(predicate) is KeywordPredicate:
-                is_match = predicate.apply(page_words)
-            elif type(predicate) is RegexPredicate:
-                is_match = predicate.apply(page_text)
-
+        for i, (predicate, is_match) in enumerate(zip(self.predicates, matches)):
             if is_match:
-                sb.compound(predicate)
-
-        sb.apply_weights(len(page_words) * self.word_count_factor, 1.0)
-        return sb.get_score(self.percentile_90)
+                sb.compound(i, predicate)
+
+        sb.apply_weights(word_count * self.word_count_factor, 1.0)
+        return sb.get_score(self.percentile_90, self.registry, truncated)
+
+    def decide(
+        self, page: str | HtmlDocument, thresholds: list[float]
+    ) -> tuple[int, Score]:
+        """
+        Finds the band of a page's score, i.e. the number of the ascending thresholds it reaches.
+        Predicates are evaluated from cheapest to most expensive, stopping only once bounds on the score show it
+        reaches no threshold. The Score of such a page only counts the predicates evaluated by then, so lies in band 0
+        but may differ from score(); pages in any other band are fully evaluated and their Score is exact.
+        """
+        features, keyword_matches = self._prepare(page)
+        word_weight = len(features.words) * self.word_count_factor
+
+        matches: list[bool | None] = [None] * len(self.predicates)
+        for tier in self.evaluation_tiers:
+            for i in tier:
+                matches[i] = self._apply(i, features, keyword_matches)
+
+            _, upper = self._bounds(matches)
+            if self._band(upper + word_weight, thresholds) == 0:
+                break
+
+        score = self.score_matches(
+            matches, len(features.words), features.document.truncated
+        )
+        return sum(score.value >= threshold for threshold in thresholds), score
+
+    def _prepare(
+        self, page: str | HtmlDocument
+    ) -> tuple[_PageFeatures, set[KeywordPredicate]]:
+        if self.stats is None:
+            features = _PageFeatures(page)
+            return features, self.keyword_index.match(features.words)
+
+        t = perf_counter()
+        features = _PageFeatures(page)
+        self.stats.record("<features>", True, perf_counter() - t)
+
+        # Keyword predicates are timed together, as the index matches them all at once
+        t = perf_counter()
+        keyword_matches = self.keyword_index.match(features.words)
+        self.stats.record("<keyword index>", bool(keyword_matches), perf_counter() - t)
+        return features, keyword_matches
+
+    def _apply(
+        self,
+        i: int,
+        features: _PageFeatures,
+        keyword_matches: set[KeywordPredicate],
+    ) -> bool:
+        if self.stats is None:
+            return self._apply_predicate(self.predicates[i], features, keyword_matches)
+
+        t = perf_counter()
+        is_match = self._apply_predicate(self.predicates[i], features, keyword_matches)
+        self.stats.record(self.predicate_names[i], is_match, perf_counter() - t)
+        return is_match
+
+    def _apply_predicate(
+        self,
+        predicate: Predicate,
+        features: _PageFeatures,
+        keyword_matches: set[KeywordPredicate],
+    ) -> bool:
+        if type(predicate) is HtmlPredicate:
+            return predicate.apply(features.document)
+        elif type(predicate) is KeywordPredicate:
+            return predicate in keyword_matches
+        elif type(predicate) is PhrasePredicate:
+            if predicate.whole_word:
+                return predicate.apply_words(iter_words(features.lower_text))
+            return predicate.apply(features.text_lower)
+        elif type(predicate) is RegexPredicate:
+            return predicate.apply(features.text)
+        return False
+
+    def _bounds(self, matches: list[bool | None]) -> tuple[float, float]:
+        # Predicates not yet evaluated (None) may or may not be compounded
+        lower = upper = 0.0
+        for predicate, is_match in zip(self.predicates, matches):
+            if is_match is False:
+                continue
+            compounded = sorted(
+                (
+                    (lower + predicate.constant_weight) * predicate.scaling_weight,
+                    (upper + predicate.constant_weight) * predicate.scaling_weight,
+                )
+            )
+            if is_match:
+                lower, upper = compounded
+            else:
+                lower, upper = min(lower, compounded[0]), max(upper, compounded[1])
+        return lower, upper
 
-    def _cleaned_text(self, page_text: str) -> str:
-        page_text = page_text.strip()
-        page_text = re.sub(r"[`!@#$%^&*()_+\-=\[\]{};':\"\\|,.<>\/?~]+", " ", page_text)
-        page_text = re.sub(r"\s+", " ", page_text)
-        return page_text
+    def _band(self, value: float, thresholds: list[float]) -> int:
+        score = logistic00(value, (self.percentile_90, 0.9))
+        return sum(score >= threshold for threshold in thresholds)
 
 
 class LinkScorer:
@@ -189,17 +595,70 @@ class LinkScorer:
         percentile_90: float,
         parent_factor: float,
         predicates: list[RegexPredicate],
+        cache_size: int = 0,
+        registry: str = "link",
     ):
         self.predicates = predicates
+        self.registry = registry
+        register_predicates(registry, predicates)
+        self.predicate_names = predicate_names(predicates)
+        # Set to a PredicateStats to count matches per predicate and time the scans
+        self.stats: PredicateStats | None = None
         self.percentile_90 = percentile_90
         self.parent_factor = parent_factor
+        self.scanner = RegexScanner(predicates)
+        # Only the parent term depends on anything but the URL, so cache the rest
+        self.url_cache = LRUCache(cache_size) if cache_size else None
 
-    def score(self, link: str, parent_page_score: float) -> Score:
-        sb = _ScoreBuilder()
-        for predicate in self.predicates:
-            if predicate.apply(link.lower()):
-                sb.compound(predicate)
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        register_predicates(self.registry, self.predicates)
 
+    def score(self, link: str, parent_page_score: float) -> Score:
+        sb = _ScoreBuilder(*self._score_url(link))
         sb.apply_weights(self.parent_factor * parent_page_score, 1.0)
 
-        return sb.get_score(self.percentile_90)
+        return sb.get_score(self.percentile_90, self.registry)
+
+    def _score_url(self, link: str) -> tuple[float, int]:
+        if self.url_cache is not None:
+            cached = self.url_cache.get(link)
+            if cached is not None:
+                if self.stats is not None:
+                    self._record_matches(cached[1])
+                return cached
+
+        if self.stats is None:
+            matches = self.scanner.scan(link.lower())
+        else:
+            # Every predicate is matched in the same scan, so only the scan as a whole is timed
+            t = perf_counter()
+            matches = self.scanner.scan(link.lower())
+            self.stats.record("<scan>", bool(matches), perf_counter() - t)
+
+        sb = _ScoreBuilder()
+        for i, predicate in enumerate(self.predicates):
+            if predicate in matches:
+                sb.compound(i, predicate)
+
+        if self.stats is not None:
+            self._record_matches(sb.mask)
+        result = (sb.value, sb.mask)
+        if self.url_cache is not None:
+            self.url_cache.put(link, result)
+        return result
+
+    def _record_matches(self, mask: int) -> None:
+        # Per scored link, whether or not its URL was cached, so match rates are over every link
+        for i, name in enumerate(self.predicate_names):
+            self.stats.record(name, bool(mask >> i & 1), 0.0)
+
+    def score_many(self, links: list[str], parent_page_score: float) -> list[Score]:
+        """
+        Scores all links found on the same page, scoring repeated links only once.
+        """
+        scores: dict[str, Score] = {}
+        for link in links:
+            if link not in scores:
+                scores[link] = self.score(link, parent_page_score)
+        return [scores[link] for link in links]
@@ -0,0 +1,70 @@
+import pytest
+
+from heuristics import artifacts
+from heuristics.dvsvc_scorers import get_link_scorer, get_page_scorer
+from heuristics.scorers import PhrasePredicate
+
+_PAGES = [
+    "<html><body><p>Scottish Women's Aid domestic abuse helpline</p></body></html>",
+    "<html><body><p>Read our privacy policy and cookies</p></body></html>",
+    "",
+]
+_LINKS = [
+    "https://womensaid.scot/get-help",
+    "https://example.gov/help",
+    "https://news.example.com/story.pdf",
+]
+
+
+@pytest.fixture(scope="module")
+def artifact_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("artifacts") / "scorers.artifact")
+    artifacts.build_artifact(path)
+    return path
+
+
+def test_round_trip_maps_automata_and_scores_as_built(artifact_path):
+    page_scorer, link_scorer = artifacts.load_artifact(artifact_path)
+
+    automaton = next(
+        p.automaton for p in page_scorer.predicates if isinstance(p, PhrasePredicate)
+    )
+    assert isinstance(automaton.edge_targets, memoryview)
+    assert automaton.edge_targets.readonly
+
+    built_page_scorer, built_link_scorer = get_page_scorer(), get_link_scorer()
+    for page_html in _PAGES:
+        score, built = page_scorer.score(page_html), built_page_scorer.score(page_html)
+        assert (score.value, score.mask) == (built.value, built.mask)
+    for link in _LINKS:
+        score, built = link_scorer.score(link, 0.5), built_link_scorer.score(link, 0.5)
+        assert (score.value, score.mask) == (built.value, built.mask)
+
+
+def test_artifacts_of_other_sources_are_rejected(artifact_path, monkeypatch):
+    monkeypatch.setattr(artifacts, "source_fingerprint", lambda: b"\0" * 32)
+    with pytest.raises(ValueError, match="out of date"):
+        artifacts.load_artifact(artifact_path)
+
+
+@pytest.mark.parametrize(
+    "start, replacement, message",
+    [
+        (0, b"NOTMAGIC", "Not a scorer artifact"),
+        (8, (artifacts._VERSION + 1).to_bytes(4, "little"), "Unsupported"),
+    ],
+)
+def test_malformed_artifacts_are_rejected(
+    artifact_path, tmp_path, start, replacement, message
+):
+    with open(artifact_path, "rb") as file:
+        data = bytearray(file.read())
+    data[start : start + len(replacement)] = replacement
+    path = tmp_path / "malformed.artifact"
+    path.write_bytes(data)
+
+    with pytest.raises(ValueError, match=message):
+        artifacts.load_artifact(str(path))
+    path.write_bytes(data[:10])
+    with pytest.raises(ValueError, match="Not a scorer artifact"):
+        artifacts.load_artifact(str(path))
@@ -0,0 +1,74 @@
+from collections import Counter
+import random
+
+import pytest
+
+from heuristics.automata import PhraseAutomaton
+from heuristics.helpers import clean_text
+from heuristics.scorers import PhrasePredicate
+
+
+def naive_matches(phrases: list[str], text: str) -> Counter:
+    # Occurrences of each distinct phrase, overlapping ones included, under the index it first appears at
+    first = {}
+    for i, phrase in enumerate(phrases):
+        if phrase:
+            first.setdefault(phrase, i)
+    return Counter(
+        {
+            i: count
+            for phrase, i in first.items()
+            if (
+                count := sum(
+                    text.startswith(phrase, start) for start in range(len(text))
+                )
+            )
+        }
+    )
+
+
+def test_matches_agree_with_naive_substring_search():
+    rng = random.Random(0)
+    for _ in range(500):
+        alphabet = "abcd"[: rng.randint(1, 4)]
+        phrases = [
+            "".join(rng.choices(alphabet, k=rng.randint(0, 4)))
+            for _ in range(rng.randint(1, 8))
+        ]
+        text = "".join(rng.choices(alphabet + "x", k=rng.randint(0, 40)))
+        automaton = PhraseAutomaton(phrases)
+
+        expected = naive_matches(phrases, text)
+        assert Counter(automaton.iter_matches(text)) == expected
+        assert automaton.search(text) == bool(expected)
+
+
+def test_word_phrases():
+    phrases = [("domestic", "abuse"), ("abuse",), ("abuse", "helpline"), ()]
+    automaton = PhraseAutomaton(phrases)
+    words = "call the domestic abuse helpline about abuse".split()
+
+    assert sorted(automaton.iter_matches(words)) == [0, 1, 1, 2]
+    assert automaton.search(words)
+    assert not automaton.search("call the helpline".split())
+
+
+@pytest.mark.parametrize("whole_word", [True, False])
+def test_phrase_predicate_agrees_with_naive_substring_search(whole_word):
+    rng = random.Random(whole_word)
+    words = ["women's", "aid", "Aid", "refuge", "scotland", "re", "fuge", "the"]
+    for _ in range(300):
+        phrases = [
+            " ".join(rng.choices(words, k=rng.randint(1, 3)))
+            for _ in range(rng.randint(1, 5))
+        ]
+        predicate = PhrasePredicate(phrases, whole_word=whole_word)
+        text = clean_text(" ".join(rng.choices(words, k=rng.randint(0, 12)))).lower()
+
+        if whole_word:
+            expected = any(f" {p} " in f" {text} " for p in predicate.phrases)
+        else:
+            expected = any(p in text for p in predicate.phrases)
+        assert predicate.apply(text) == expected
+        if whole_word:
+            assert predicate.apply_words(text.split()) == expected
@@ -0,0 +1,77 @@
+import copy
+import random
+
+import numpy as np
+import pytest
+
+from heuristics.batch import batch_scores, predicate_matrix, rescore, scorer_weights
+from heuristics.dvsvc_scorers import get_page_scorer
+from heuristics.scorers import PageScorer
+
+_WORDS = (
+    "domestic abuse violence helpline refuge shelter support women's aid call free "
+    "confidential 24 hour scotland the and news privacy cookies quick exit"
+).split()
+
+
+@pytest.fixture(scope="module")
+def page_scorer():
+    return get_page_scorer()
+
+
+def _pages(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        "<html><head><title>%s</title></head><body><p>%s</p>%s</body></html>"
+        % (
+            " ".join(rng.choices(_WORDS, k=rng.randint(0, 4))),
+            " ".join(rng.choices(_WORDS, k=rng.randint(0, 60))),
+            "<button>Quick exit</button>" if rng.random() < 0.3 else "",
+        )
+        for _ in range(count)
+    ]
+
+
+def test_batch_scores_match_page_scores(page_scorer):
+    pages = _pages(200, 0)
+    matches, word_counts = predicate_matrix(page_scorer, pages)
+    assert matches.shape == (len(pages), len(page_scorer.predicates))
+
+    pscores = batch_scores(
+        matches,
+        word_counts,
+        *scorer_weights(page_scorer),
+        page_scorer.word_count_factor,
+        page_scorer.percentile_90,
+    )
+    assert pscores == pytest.approx([page_scorer.score(p).value for p in pages])
+
+
+def test_rescoring_matches_a_scorer_with_the_new_weights(page_scorer):
+    rng = np.random.default_rng(1)
+    matches = rng.random((300, len(page_scorer.predicates))) < 0.1
+    word_counts = rng.integers(0, 2000, 300)
+    constant_weights = rng.uniform(-2, 8, len(page_scorer.predicates))
+    scaling_weights = rng.uniform(0.8, 1.25, len(page_scorer.predicates))
+
+    predicates = [copy.copy(p) for p in page_scorer.predicates]
+    for predicate, constant, scaling in zip(
+        predicates, constant_weights, scaling_weights
+    ):
+        predicate.constant_weight, predicate.scaling_weight = constant, scaling
+    reweighted = PageScorer(100.0, 0.002, predicates, registry="test-batch")
+    expected = [
+        reweighted.score_matches(list(row), count).value
+        for row, count in zip(matches, word_counts)
+    ]
+
+    pscores = rescore(
+        page_scorer,
+        matches,
+        word_counts,
+        constant_weights,
+        scaling_weights,
+        0.002,
+        100.0,
+    )
+    assert pscores == pytest.approx(expected)
@@ -0,0 +1,36 @@
+from heuristics.caches import ScoreCache
+from heuristics.scorers import KeywordPredicate, Score, register_predicates
+
+_REGISTRY = "test-caches"
+register_predicates(
+    _REGISTRY, [KeywordPredicate({"refuge"}, constant_weight=1.0, alias="REFUGE")]
+)
+
+
+def _saved_cache(path: str, max_scored_bytes: int) -> bytes:
+    cache = ScoreCache(_REGISTRY, 10, path, max_scored_bytes)
+    key = ScoreCache.content_key(b"<p>refuge</p>")
+    cache.put(key, Score(0.9, 1, _REGISTRY, True))
+    cache.save()
+    return key
+
+
+def test_persisted_scores_reload(tmp_path):
+    path = str(tmp_path / "pscore_cache.pickle")
+    key = _saved_cache(path, 1024)
+
+    score = ScoreCache(_REGISTRY, 10, path, 1024).get(key)
+    assert (score.value, score.mask, score.registry, score.truncated) == (
+        0.9,
+        1,
+        _REGISTRY,
+        True,
+    )
+
+
+def test_persisted_scores_discarded_when_scored_bytes_cap_changes(tmp_path):
+    path = str(tmp_path / "pscore_cache.pickle")
+    key = _saved_cache(path, 1024)
+
+    assert ScoreCache(_REGISTRY, 10, path, 2048).get(key) is None
+    assert ScoreCache(_REGISTRY, 10, path).get(key) is None
@@ -0,0 +1,42 @@
+import pytest
+
+from heuristics.documents import HtmlDocument
+from heuristics.dvsvc_scorers import get_page_scorer
+
+_EMPTY_PAGES = [
+    "",
+    "<!DOCTYPE html>",
+    "<!-- a --><!-- b -->",
+    "<?php echo 1; ?>",
+    "<?xml version='1.0'?>\n<!DOCTYPE html>\n<!-- nothing -->",
+]
+
+
+@pytest.fixture(scope="module")
+def page_scorer():
+    return get_page_scorer()
+
+
+@pytest.mark.parametrize("page_html", _EMPTY_PAGES)
+def test_markup_without_elements_parses_as_empty_page(page_html):
+    document = HtmlDocument.from_html(page_html)
+
+    assert document.root.tag == "html"
+    assert document.text == ""
+
+
+@pytest.mark.parametrize("page_html", _EMPTY_PAGES)
+def test_markup_without_elements_scores_as_empty_page(page_scorer, page_html):
+    score = page_scorer.score(page_html)
+
+    assert score.value == pytest.approx(0, abs=1e-3)
+    assert score.value == page_scorer.score("<html/>").value
+    assert score.mask == 0
+    assert page_scorer.decide(page_html, [0.8, 0.95])[0] == 0
+
+
+def test_truncation_to_a_comment_parses_as_empty_page():
+    document = HtmlDocument.from_html("<!-- a comment --><p>refuge</p>", max_bytes=18)
+
+    assert document.truncated
+    assert document.text == ""
@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pytest
+
+from heuristics.batch import batch_scores, scorer_weights
+from heuristics.features import (
+    FeatureStoreWriter,
+    hash64,
+    load_feature_store,
+    resolve_features,
+)
+from heuristics.scorers import KeywordPredicate, PageScorer
+
+
+def _page_scorer() -> PageScorer:
+    return PageScorer(
+        0.9,
+        0.001,
+        [
+            KeywordPredicate({"refuge"}, constant_weight=0.5, alias="REFUGE"),
+            KeywordPredicate({"helpline"}, scaling_weight=2.0, alias="HELPLINE"),
+        ],
+        registry="test-features",
+    )
+
+
+_PAGES = [
+    ("https://a.org/", b"a", "a.org", "<p>refuge helpline</p>"),
+    ("https://a.org/x", b"x", "a.org", "<p>nothing here</p>"),
+    ("https://b.org/", b"b", "b.org", "<p>helpline</p>"),
+]
+
+
+def _write(path: str, scorer: PageScorer) -> None:
+    writer = FeatureStoreWriter(path, scorer)
+    for url, content, fld, page_html in _PAGES:
+        writer.append(url, content, fld, scorer.evaluate(page_html))
+    # The same content under another URL, only referencing the first
+    writer.append("https://b.org/copy", b"a", "b.org", None)
+    writer.close()
+
+
+def test_round_trip_rescores_as_the_scorer(tmp_path):
+    scorer = _page_scorer()
+    path = str(tmp_path / "features")
+    _write(path, scorer)
+
+    header, columns = load_feature_store(path)
+    assert all(isinstance(c, np.memmap) for c in columns.values())
+    assert list(columns["fld"]) == [
+        hash64(f) for f in ("a.org", "a.org", "b.org", "b.org")
+    ]
+
+    matches, word_counts, resolved = resolve_features(columns, 2)
+    assert resolved.all()
+    pscores = batch_scores(
+        matches,
+        word_counts,
+        *scorer_weights(scorer),
+        header["word_count_factor"],
+        header["percentile_90"],
+    )
+    expected = [scorer.score(page_html).value for *_, page_html in _PAGES]
+    assert pscores == pytest.approx(expected + expected[:1])
+
+
+def test_columns_load_separately_and_appends_continue(tmp_path):
+    scorer = _page_scorer()
+    path = str(tmp_path / "features")
+    _write(path, scorer)
+    _write(path, scorer)
+
+    _, columns = load_feature_store(path, ["word_count"])
+    assert list(columns) == ["word_count"]
+    assert len(columns["word_count"]) == 8
+
+    # A partially flushed column is ignored past the rows every column has
+    with open(os.path.join(path, "url.bin"), "ab") as file:
+        file.write(b"\0" * 8)
+    _, columns = load_feature_store(path)
+    assert {len(c) for c in columns.values()} == {8}
+
+
+def test_stores_of_other_predicates_are_rejected(tmp_path):
+    path = str(tmp_path / "features")
+    _write(path, _page_scorer())
+    other = PageScorer(
+        0.9,
+        0.001,
+        [KeywordPredicate({"refuge"}, alias="REFUGE")],
+        registry="test-features-other",
+    )
+
+    with pytest.raises(ValueError, match="different predicates"):
+        FeatureStoreWriter(path, other)
+    with pytest.raises(ValueError, match="Not a feature store"):
+        load_feature_store(str(tmp_path))
@@ -0,0 +1,31 @@
+import random
+import re
+
+import pytest
+
+from heuristics import helpers
+
+_ALPHABET = (
+    "abcXYZ09é" + helpers._PUNCTUATION + " \t\n\r\x0b\x0c\x1c\x85\xa0\u2028\u3000"
+)
+
+
+def old_clean_text(text: str) -> str:
+    # clean_text as it was before it tokenized in chunks
+    text = text.strip()
+    text = re.sub(r"[`!@#$%^&*()_+\-=\[\]{};':\"\\|,.<>\/?~]+", " ", text)
+    text = re.sub(r"\s+", " ", text)
+    return text
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 16, 1 << 16])
+def test_tokenizers_agree_with_old_clean_text(monkeypatch, chunk_size):
+    monkeypatch.setattr(helpers, "_WORD_CHUNK_SIZE", chunk_size)
+    rng = random.Random(chunk_size)
+    for _ in range(2000):
+        text = "".join(rng.choices(_ALPHABET, k=rng.randint(0, 60)))
+        cleaned = old_clean_text(text)
+
+        assert helpers.clean_text(text) == cleaned
+        assert list(helpers.iter_words(text)) == [w for w in cleaned.split(" ") if w]
+        assert helpers.word_set(text) == set(cleaned.split(" "))
@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from heuristics.documents import HtmlDocument
+from heuristics.dvsvc_scorers import get_link_scorer, get_page_scorer
+from heuristics.helpers import clean_text
+from heuristics.scorers import KeywordIndex, KeywordPredicate, PageScorer
+
+_PREDICATES = [
+    KeywordPredicate({"refuge", "shelter"}, constant_weight=0.5, alias="SHELTER"),
+    KeywordPredicate(
+        {"domestic"}, {"abuse", "violence"}, scaling_weight=2.0, alias="DOMESTIC"
+    ),
+    KeywordPredicate(
+        {"Helpline", "CALL", "phone", "text"},
+        required_occurrences_per_set=2,
+        alias="CONTACT",
+    ),
+    # Keywords are matched against single words, so this never matches
+    KeywordPredicate({"women's aid", "safe space"}, alias="MULTI-WORD"),
+    KeywordPredicate({"24"}, {"hours", "7"}, constant_weight=-0.5, alias="OPENING"),
+]
+_WORDS = [
+    "refuge",
+    "Refuge",
+    "REFUGE",
+    "refuges",
+    "shelter",
+    "domestic",
+    "Domestic",
+    "abuse",
+    "abuse,",
+    "(abuse)",
+    "abuse-related",
+    "non-violence",
+    "violence.",
+    "helpline",
+    "HELPLINE:",
+    "call",
+    "phone",
+    "phones",
+    "text",
+    "women's",
+    "aid",
+    "safe",
+    "space",
+    "24/7",
+    "hours",
+    "the",
+    "and",
+    "support",
+    "0808",
+]
+
+
+def _pages(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        "<html><body>%s</body></html>"
+        % "".join(
+            "<p>%s</p>" % " ".join(rng.choices(_WORDS, k=rng.randint(0, 12)))
+            for _ in range(rng.randint(1, 6))
+        )
+        for _ in range(count)
+    ]
+
+
+def _old_page_words(page_html: str) -> set[str]:
+    # The page's words as KeywordPredicate.apply was called on them, one predicate at a time
+    return set(clean_text(HtmlDocument.from_html(page_html).text).lower().split(" "))
+
+
+def test_index_matches_predicates_one_at_a_time():
+    index = KeywordIndex(_PREDICATES)
+    for page_html in _pages(500, 0):
+        words = _old_page_words(page_html)
+        assert index.match(words) == {p for p in _PREDICATES if p.apply(words)}
+
+
+@pytest.mark.parametrize("get_scorer", [get_page_scorer, get_link_scorer])
+def test_index_matches_dvsvc_keyword_predicates(get_scorer):
+    predicates = [p for p in get_scorer().predicates if type(p) is KeywordPredicate]
+    index = KeywordIndex(predicates)
+    vocabulary = _WORDS + sorted(
+        {
+            keyword
+            for p in predicates
+            for keywords in p.keyword_sets
+            for keyword in keywords
+        }
+    )
+    rng = random.Random(1)
+    for _ in range(500):
+        words = set(rng.choices(vocabulary, k=rng.randint(0, 40)))
+        assert index.match(words) == {p for p in predicates if p.apply(words)}
+
+
+def test_scores_match_predicates_one_at_a_time():
+    page_scorer = PageScorer(0.9, 0.001, _PREDICATES, registry="test-keywords")
+    for page_html in _pages(200, 2):
+        words = _old_page_words(page_html)
+        expected = page_scorer.score_matches(
+            [p.apply(words) for p in _PREDICATES], len(words)
+        )
+
+        score = page_scorer.score(page_html)
+        assert (score.value, score.mask) == (expected.value, expected.mask)
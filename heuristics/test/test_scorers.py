@@ -0,0 +1,40 @@
+import pytest
+
+from heuristics.scorers import LinkScorer, PredicateStats, RegexPredicate
+
+
+def _link_scorer(cache_size: int) -> LinkScorer:
+    link_scorer = LinkScorer(
+        0.9,
+        0.5,
+        [
+            RegexPredicate({"help"}, constant_weight=1.0, alias="HELP"),
+            RegexPredicate({r"\.pdf$"}, constant_weight=-1.0, alias="PDF"),
+        ],
+        cache_size,
+        registry="test-scorers",
+    )
+    link_scorer.stats = PredicateStats()
+    return link_scorer
+
+
+@pytest.mark.parametrize("cache_size", [0, 100])
+def test_link_predicate_stats_count_every_scored_link(cache_size):
+    link_scorer = _link_scorer(cache_size)
+    links = ["https://a.org/help", "https://a.org/help", "https://a.org/x.pdf"] * 2
+    for link in links:
+        link_scorer.score(link, 0.5)
+
+    calls = {name: counter[:2] for name, counter in link_scorer.stats.counters.items()}
+    assert calls["RX-HELP"] == [6, 4]
+    assert calls["RX-PDF"] == [6, 2]
+    # Only URLs missing from the cache are scanned
+    assert calls["<scan>"][0] == (2 if cache_size else 6)
+
+
+def test_cached_link_scores_match_uncached():
+    cached, uncached = _link_scorer(100), _link_scorer(0)
+    for link in ["https://a.org/help", "https://a.org/help.pdf"] * 2:
+        for parent in (0.0, 0.9):
+            a, b = cached.score(link, parent), uncached.score(link, parent)
+            assert (a.value, a.mask) == (b.value, b.mask)